@@ -0,0 +1,56 @@
+"""
+Benchmark de calculate_rfm_metrics frente a calculate_rfm_metrics_fast
+
+Uso:
+    python benchmarks/bench_rfm.py --rows 1000000 2000000 5000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+from utils.data_utils import calculate_rfm_metrics, clean_retail_data
+from utils.rfm_engine import calculate_rfm_metrics_fast, check_rfm_parity
+from utils.synthetic_data import generate_online_retail
+
+
+def make_transactions(n_rows, n_customers=None, seed=42):
+    """Generar transacciones sintéticas con el esquema Online Retail limpio"""
+    raw = generate_online_retail(n_rows, n_customers=n_customers or max(100, n_rows // 100), seed=seed)
+    return clean_retail_data(raw)
+
+
+def time_call(func, *args, repeat=3):
+    """Mejor tiempo de varias ejecuciones en segundos"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 2_000_000, 5_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'Filas':>12} {'Clientes':>10} {'Actual (s)':>11} {'Rápido (s)':>11} {'Speedup':>8} {'Paridad':>8}")
+    print("-" * 66)
+
+    for n_rows in args.rows:
+        df = make_transactions(n_rows)
+        parity = check_rfm_parity(df)
+
+        baseline = time_call(calculate_rfm_metrics, df, repeat=args.repeat)
+        fast = time_call(calculate_rfm_metrics_fast, df, repeat=args.repeat)
+
+        print(f"{n_rows:>12,} {df['CustomerID'].nunique():>10,} {baseline:>11.3f} "
+              f"{fast:>11.3f} {baseline / fast:>7.1f}x {'OK' if parity['ok'] else 'FALLO':>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark de latencia de predict_proba de sklearn frente al ensemble compilado
+
+Usa los artefactos de results/models si existen; si no, entrena un
+GradientBoosting y un RandomForest sintéticos con la misma configuración
+que config.MODELS_CONFIG. La columna "auto" es predict_proba del modelo
+compilado, que delega en sklearn por encima de max_compiled_rows.
+
+Uso:
+    python benchmarks/bench_tree_inference.py --batch-sizes 1 10 100 1000 10000 100000
+"""
+
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "src"))
+from config import MODELS_CONFIG, MODELS_DIR, RANDOM_STATE
+from utils.tree_compiler import compile_tree_ensemble
+
+
+def load_or_train_models(n_features=10):
+    """Modelos de producción si existen; modelos sintéticos en otro caso"""
+    model_path = MODELS_DIR / 'best_loyalty_model.pkl'
+    if model_path.exists():
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        return {type(model).__name__: model}, model.n_features_in_
+
+    from sklearn.datasets import make_classification
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+    X, y = make_classification(n_samples=5000, n_features=n_features, n_informative=6,
+                               random_state=RANDOM_STATE)
+    models = {
+        'GradientBoostingClassifier': GradientBoostingClassifier(**MODELS_CONFIG['gradient_boosting']),
+        'RandomForestClassifier': RandomForestClassifier(**MODELS_CONFIG['random_forest'])
+    }
+    for model in models.values():
+        model.fit(X, y)
+    return models, n_features
+
+
+def best_time(func, X, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia sklearn vs ensemble compilado")
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[1, 10, 100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    models, n_features = load_or_train_models()
+    rng = np.random.default_rng(RANDOM_STATE)
+
+    for name, model in models.items():
+        compiled = compile_tree_ensemble(model)
+        print(f"\n{name}: {compiled.n_trees} árboles, {compiled.n_nodes:,} nodos, "
+              f"profundidad {compiled.max_depth}")
+        print(f"{'Lote':>8} {'sklearn (ms)':>13} {'compilado (ms)':>15} {'auto (ms)':>10} "
+              f"{'Speedup':>8} {'Idéntico':>9}")
+        print("-" * 68)
+
+        for batch_size in args.batch_sizes:
+            X = rng.normal(size=(batch_size, n_features))
+            identical = np.array_equal(model.predict_proba(X), compiled.predict_proba_compiled(X))
+
+            repeat = args.repeat if batch_size <= 10000 else max(1, args.repeat // 2)
+            sklearn_time = best_time(model.predict_proba, X, repeat)
+            compiled_time = best_time(compiled.predict_proba_compiled, X, repeat)
+            auto_time = best_time(compiled.predict_proba, X, repeat)
+
+            print(f"{batch_size:>8,} {sklearn_time * 1000:>13.3f} {compiled_time * 1000:>15.3f} "
+                  f"{auto_time * 1000:>10.3f} {sklearn_time / auto_time:>7.1f}x "
+                  f"{'sí' if identical else 'NO':>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""
+Suite de benchmarks de regresión para src/utils y la ruta de puntuación
+
+Mide tiempo de pared (mejor de --repeat ejecuciones) y memoria máxima
+(tracemalloc, en una ejecución aparte) de cada caso a varias escalas de
+transacciones y de clientes.
+
+Uso:
+    python benchmarks/run_benchmarks.py --save benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --transactions 10000 1000000 10000000 --customers 1000 1000000
+    python benchmarks/run_benchmarks.py --cases calculate_rfm_metrics make_prediction
+
+Con --compare el proceso termina con código 1 si algún caso es más lento o
+usa más memoria que la referencia por encima de la tolerancia.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "src"))
+from utils.business_segmentation_spanish import (
+    generate_customer_insights, generate_customer_insights_batch
+)
+from utils.customer_lookup import CustomerStore
+from utils.data_utils import (
+    calculate_rfm_metrics, clean_retail_data, create_customer_features, define_loyalty_target
+)
+from utils.feature_engine import CUSTOMER_FEATURES_COLUMNS
+from utils.instrumentation import disable as disable_instrumentation, is_enabled
+from utils.scoring import MODEL_FEATURE_COLUMNS, assemble_feature_matrix, score_batch
+from utils.synthetic_data import generate_online_retail
+from utils.trends_utils import aggregate_trends_monthly, merge_trends_with_customers
+
+DEFAULT_TRANSACTIONS = [10_000, 100_000, 1_000_000]
+DEFAULT_CUSTOMERS = [1_000, 10_000, 100_000]
+TRENDS_KEYWORDS = ['online shopping', 'retail therapy', 'gift shopping']
+
+
+# === Datos sintéticos ===
+
+def make_raw_transactions(n_rows, seed=42):
+    """Transacciones en bruto con el esquema Online Retail (incluye cancelaciones y nulos)"""
+    return generate_online_retail(n_rows, n_customers=max(100, n_rows // 25), seed=seed)
+
+
+def make_trends_monthly(seed=42):
+    """Tendencias semanales sintéticas agregadas por mes"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2010-11-01', '2012-01-31', freq='W')
+    trends = pd.DataFrame({
+        f'trends_{keyword.replace(" ", "_")}': np.clip(
+            50 + 30 * np.sin(2 * np.pi * np.arange(len(dates)) / 52) + rng.normal(0, 10, len(dates)),
+            0, 100)
+        for keyword in TRENDS_KEYWORDS
+    }, index=pd.DatetimeIndex(dates, name='date'))
+    return aggregate_trends_monthly(trends)
+
+
+def make_customers(n_customers, seed=42):
+    """Tabla de clientes con el esquema de customer_features_with_trends.csv"""
+    rng = np.random.default_rng(seed)
+    customers = pd.DataFrame({
+        'CustomerID': np.arange(12346, 12346 + n_customers, dtype=np.int64),
+        'Recency': rng.integers(1, 374, n_customers),
+        'Frequency': rng.geometric(0.3, n_customers),
+        'Monetary': np.round(rng.lognormal(6, 1.2, n_customers), 2),
+        'TotalQuantity': rng.integers(1, 5000, n_customers),
+        'AvgQuantity': rng.gamma(2, 5, n_customers),
+        'StdQuantity': rng.gamma(2, 3, n_customers),
+        'AvgUnitPrice': rng.gamma(2, 2, n_customers),
+        'StdUnitPrice': rng.gamma(2, 1, n_customers),
+        'AvgRevenue': rng.gamma(2, 15, n_customers),
+        'StdRevenue': rng.gamma(2, 10, n_customers),
+        'UniqueProducts': rng.integers(1, 300, n_customers),
+        'CustomerLifespan': rng.integers(0, 374, n_customers),
+        'Country': rng.choice(['United Kingdom', 'Germany', 'France'], n_customers),
+        'IsLoyal': rng.integers(0, 2, n_customers)
+    })[CUSTOMER_FEATURES_COLUMNS]
+
+    for keyword in TRENDS_KEYWORDS:
+        col = f'trends_{keyword.replace(" ", "_")}'
+        customers[f'avg_{col}'] = rng.uniform(20, 80, n_customers)
+        customers[f'std_{col}'] = rng.uniform(0, 20, n_customers)
+        customers[f'max_{col}'] = rng.uniform(50, 100, n_customers)
+    customers['probability'] = rng.random(n_customers)
+    return customers
+
+
+def make_model_artifacts(seed=42):
+    """Scaler, selector y GradientBoosting entrenados sobre datos sintéticos"""
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.feature_selection import SelectKBest, f_classif
+    from sklearn.preprocessing import StandardScaler
+
+    customers = make_customers(5000, seed)
+    country_codes = np.random.default_rng(seed).integers(0, 4, len(customers))
+    X = assemble_feature_matrix(customers.assign(Country_encoded=country_codes))
+    y = ((customers['Frequency'] >= 3) & (customers['Recency'] < 200)).astype(int).to_numpy()
+
+    scaler = StandardScaler().fit(X)
+    selector = SelectKBest(f_classif, k=12).fit(scaler.transform(X), y)
+    model = GradientBoostingClassifier(n_estimators=100, random_state=seed)
+    model.fit(selector.transform(scaler.transform(X)), y)
+    return model, scaler, selector
+
+
+# === Casos ===
+# Cada caso recibe la escala y un diccionario de datos compartidos y devuelve
+# la función sin argumentos que se mide.
+
+class DataCache:
+    """
+    Genera cada conjunto de datos una sola vez por escala
+
+    Los archivos auxiliares se escriben en un directorio temporal propio que
+    se borra al cerrar la caché (usarla con with).
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix='bench_')
+        self.tmp_path = Path(self._tmp_dir.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._data.clear()
+        self._tmp_dir.cleanup()
+
+    def get(self, name, scale, factory):
+        key = (name, scale)
+        if key not in self._data:
+            self._data[key] = factory()
+        return self._data[key]
+
+
+def case_load_and_clean(n_rows, data):
+    raw = data.get('raw', n_rows, lambda: make_raw_transactions(n_rows))
+    # La lectura de Excel no escala a millones de filas: se mide la limpieza
+    return lambda: clean_retail_data(raw.copy())
+
+
+def clean_transactions(n_rows, data):
+    return data.get('clean', n_rows, lambda: clean_retail_data(make_raw_transactions(n_rows)))
+
+
+def case_calculate_rfm_metrics(n_rows, data):
+    transactions = clean_transactions(n_rows, data)
+    return lambda: calculate_rfm_metrics(transactions)
+
+
+def case_create_customer_features(n_rows, data):
+    transactions = clean_transactions(n_rows, data)
+    return lambda: create_customer_features(transactions)
+
+
+def case_merge_trends_with_customers(n_rows, data):
+    transactions = clean_transactions(n_rows, data)
+    customers = data.get('rfm', n_rows, lambda: calculate_rfm_metrics(transactions))
+    trends = data.get('trends', 0, make_trends_monthly)
+    return lambda: merge_trends_with_customers(customers, trends, transactions)
+
+
+def case_define_loyalty_target(n_customers, data):
+    customers = data.get('customers', n_customers, lambda: make_customers(n_customers))
+    return lambda: define_loyalty_target(customers)
+
+
+def case_customer_lookup(n_customers, data):
+    customers = data.get('customers', n_customers, lambda: make_customers(n_customers))
+    path = data.get('customers_csv', n_customers,
+                    lambda: _write_customers_csv(customers, data.tmp_path / f'customers_{n_customers}.csv'))
+    ids = customers['CustomerID'].sample(min(1000, n_customers), random_state=42).tolist()
+
+    def run():
+        # Carga con índice, 1000 búsquedas por ID y consultas top-N
+        store = CustomerStore(path)
+        for customer_id in ids:
+            store.get(customer_id)
+        store.top_by_monetary(10)
+        store.top_at_risk(10)
+    return run
+
+
+def _write_customers_csv(customers, path):
+    customers.to_csv(path, index=False)
+    return path
+
+
+def case_generate_customer_insights(n_customers, data):
+    customers = data.get('customers', n_customers, lambda: make_customers(n_customers))
+    return lambda: generate_customer_insights_batch(customers)
+
+
+def case_generate_customer_insights_single(n_customers, data):
+    customers = data.get('customers', n_customers, lambda: make_customers(n_customers))
+    records = customers.head(1000).to_dict('records')
+    return lambda: [generate_customer_insights(record) for record in records]
+
+
+def case_make_prediction(n_customers, data):
+    model, scaler, selector = data.get('model', 0, make_model_artifacts)
+    customers = data.get('customers', n_customers, lambda: make_customers(n_customers))
+    records = customers.head(1000).assign(Country_encoded=1)[MODEL_FEATURE_COLUMNS].to_dict('records')
+
+    def run():
+        # Mismo cuerpo que demo_app.make_prediction, para 1000 clientes uno a uno
+        for features in records:
+            score_batch(assemble_feature_matrix([features]), model, scaler, selector, noise_std=0.1)
+    return run
+
+
+def case_score_batch(n_customers, data):
+    model, scaler, selector = data.get('model', 0, make_model_artifacts)
+    customers = data.get('customers', n_customers, lambda: make_customers(n_customers))
+    X = assemble_feature_matrix(customers.assign(Country_encoded=1))
+    return lambda: score_batch(X, model, scaler, selector)
+
+
+# Nombre -> (escala, función de preparación)
+CASES = {
+    'load_and_clean_retail_data': ('transactions', case_load_and_clean),
+    'calculate_rfm_metrics': ('transactions', case_calculate_rfm_metrics),
+    'create_customer_features': ('transactions', case_create_customer_features),
+    'merge_trends_with_customers': ('transactions', case_merge_trends_with_customers),
+    'define_loyalty_target': ('customers', case_define_loyalty_target),
+    'customer_lookup': ('customers', case_customer_lookup),
+    'generate_customer_insights': ('customers', case_generate_customer_insights),
+    'generate_customer_insights_single_1k': ('customers', case_generate_customer_insights_single),
+    'make_prediction_1k': ('customers', case_make_prediction),
+    'score_batch': ('customers', case_score_batch)
+}
+
+
+# === Medición ===
+
+def measure(func, repeat):
+    """Mejor tiempo de repeat ejecuciones y memoria máxima de una ejecución con tracemalloc"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': best, 'peak_mb': peak / 2**20}
+
+
+def run_suite(case_names, transaction_scales, customer_scales, repeat):
+    results = {}
+    with DataCache() as data:
+        for name in case_names:
+            kind, setup = CASES[name]
+            scales = transaction_scales if kind == 'transactions' else customer_scales
+            for scale in scales:
+                key = f'{name}@{kind}={scale}'
+                func = setup(scale, data)
+                results[key] = measure(func, repeat)
+                print(f"{key:<60} {results[key]['seconds'] * 1000:>12.1f} ms "
+                      f"{results[key]['peak_mb']:>10.1f} MB")
+    return results
+
+
+def environment():
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """
+    Compara con la referencia y devuelve los casos con regresión
+
+    Returns:
+        list: Claves de casos más lentos o con más memoria que la tolerancia
+    """
+    regressions = []
+    print(f"\n{'Caso':<60} {'Tiempo':>10} {'Memoria':>10}")
+    print("-" * 84)
+    for key, current in results.items():
+        reference = baseline['results'].get(key)
+        if reference is None:
+            print(f"{key:<60} {'(nuevo)':>10}")
+            continue
+
+        time_ratio = current['seconds'] / reference['seconds'] if reference['seconds'] > 0 else 1.0
+        memory_ratio = current['peak_mb'] / reference['peak_mb'] if reference['peak_mb'] > 0 else 1.0
+        slow = time_ratio > 1 + time_tolerance
+        heavy = memory_ratio > 1 + memory_tolerance
+        flag = '  <-- REGRESIÓN' if slow or heavy else ''
+        if flag:
+            regressions.append(key)
+        print(f"{key:<60} {time_ratio:>9.2f}x {memory_ratio:>9.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de regresión de rendimiento")
+    parser.add_argument('--transactions', type=int, nargs='+', default=DEFAULT_TRANSACTIONS,
+                        help="Escalas de transacciones (10k a 10M)")
+    parser.add_argument('--customers', type=int, nargs='+', default=DEFAULT_CUSTOMERS,
+                        help="Escalas de clientes (1k a 1M)")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', metavar='JSON', help="Guardar los resultados como referencia")
+    parser.add_argument('--compare', metavar='JSON', help="Comparar con una referencia guardada")
+    parser.add_argument('--time-tolerance', type=float, default=0.2,
+                        help="Aumento de tiempo tolerado (0.2 = 20%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.2,
+                        help="Aumento de memoria tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Los spans reinician el pico de tracemalloc y añaden coste a cada llamada
+    if is_enabled():
+        print("RETAIL_INSTRUMENTATION se ignora durante los benchmarks")
+        disable_instrumentation()
+
+    results = run_suite(args.cases, args.transactions, args.customers, args.repeat)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"\nReferencia guardada en: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} caso(s) con regresión")
+            sys.exit(1)
+        print("\nSin regresiones")
+
+
+if __name__ == '__main__':
+    main()
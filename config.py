@@ -16,6 +16,7 @@ RESULTS_DIR = PROJECT_ROOT / "results"
 MODELS_DIR = RESULTS_DIR / "models"
 FIGURES_DIR = RESULTS_DIR / "figures"
 REPORTS_DIR = RESULTS_DIR / "reports"
+CACHE_DIR = PROCESSED_DATA_DIR / "cache"
 
 # Configuración de datos
 ONLINE_RETAIL_URL = "https://archive.ics.uci.edu/dataset/352/online+retail"
@@ -11,6 +11,9 @@ import sys
 sys.path.append(str(Path(__file__).parent / "src"))
 from utils.business_segmentation_spanish import generate_customer_insights
 from utils.customer_lookup import search_customer_by_id, get_random_customers, get_top_customers_by_value, get_customers_at_risk
+from utils.scoring import assemble_feature_matrix, score_batch, score_batch_monte_carlo
+from utils.prediction_cache import PredictionCache, cached_prediction, cached_insights
+from utils.instrumentation import export, instrumented, is_enabled, stages, summarize
 
 @st.cache_resource
 def load_models():
@@ -24,46 +27,50 @@ def load_models():
         st.error(f"Error cargando modelos: {e}")
         return None, None, None
 
-def make_prediction(features, model, scaler, selector):
-    """Realizar predicción con ruido añadido"""
-    full_features = {
-        'Recency': features.get('Recency', 30),
-        'Frequency': features.get('Frequency', 5),
-        'Monetary': features.get('Monetary', 500),
-        'TotalQuantity': features.get('TotalQuantity', 10),
-        'AvgQuantity': features.get('AvgQuantity', 2.0),
-        'AvgUnitPrice': features.get('AvgUnitPrice', 3.5),
-        'AvgRevenue': features.get('AvgRevenue', 100.0),
-        'UniqueProducts': features.get('UniqueProducts', 10),
-        'CustomerLifespan': features.get('CustomerLifespan', 90),
-        'avg_trends_online_shopping': 50.0,
-        'std_trends_online_shopping': 10.0,
-        'max_trends_online_shopping': 80.0,
-        'avg_trends_retail_therapy': 45.0,
-        'std_trends_retail_therapy': 8.0,
-        'max_trends_retail_therapy': 75.0,
-        'avg_trends_gift_shopping': 40.0,
-        'std_trends_gift_shopping': 12.0,
-        'max_trends_gift_shopping': 70.0,
-        'Country_encoded': features.get('Country_encoded', 1)
-    }
-    
-    df = pd.DataFrame([full_features])
-    X_scaled = scaler.transform(df)
+@st.cache_resource
+def get_prediction_cache():
+    """Caché de predicciones compartida por todas las sesiones"""
+    return PredictionCache(maxsize=4096)
+
+@instrumented(name='demo.make_prediction')
+def make_prediction(features, model, scaler, selector, noise_std=0.1):
+    """Realizar predicción (con ruido añadido salvo que noise_std=0)"""
+    X = assemble_feature_matrix([features])
     
     # Añadir ruido gaussiano como en el entrenamiento
-    np.random.seed(None)  # Cambiar seed para variabilidad
-    noise = np.random.normal(0, 0.1, X_scaled.shape)  # Reducir ruido
-    X_noisy = X_scaled + noise
+    predictions, probabilities = score_batch(X, model, scaler, selector, noise_std=noise_std)
     
-    X_selected = selector.transform(X_noisy)
-    
-    prediction = model.predict(X_selected)[0]
-    probability = model.predict_proba(X_selected)[0, 1]
-    
-    return prediction, probability
+    return predictions[0], probabilities[0]
+
+@instrumented(name='demo.make_prediction_monte_carlo')
+def make_prediction_monte_carlo(features, model, scaler, selector, n_replicas=300, noise_std=0.1):
+    """Probabilidad media e intervalo del 95% sobre réplicas con ruido"""
+    X = assemble_feature_matrix([features])
+    predictions, mean, lower, upper = score_batch_monte_carlo(
+        X, model, scaler, selector, n_replicas=n_replicas, noise_std=noise_std
+    )
+    return predictions[0], mean[0], (lower[0], upper[0])
 
+@instrumented(name='demo.rerun')
 def main():
+    # Etapas medidas si RETAIL_INSTRUMENTATION está activa; la última se
+    # cierra aunque la ejecución termine con st.stop() o una excepción
+    stage = stages('demo')
+    try:
+        render_app(stage)
+    finally:
+        stage.end()
+    
+    if is_enabled():
+        with st.sidebar.expander("⏱️ Instrumentación"):
+            st.caption("Puntos calientes acumulados en esta sesión (tiempo propio en ms)")
+            st.dataframe(summarize(top=10)[['name', 'calls', 'self_ms', 'mean_ms', 'peak_mb']],
+                         hide_index=True, use_container_width=True)
+            if st.button("💾 Exportar traza"):
+                n_spans = export('results/reports/demo_trace.json')
+                st.success(f"{n_spans} spans en results/reports/demo_trace.json")
+
+def render_app(stage):
     st.set_page_config(
         page_title="Predicción de Fidelización de Clientes",
         page_icon="🎯",
@@ -75,11 +82,13 @@ def main():
     st.markdown("*Autora: Magda Monroy Jiménez | Universidad Complutense de Madrid*")
     
     # Cargar modelos
+    stage.start('load_models')
     model, scaler, selector = load_models()
     if model is None:
         st.stop()
     
     # === SIDEBAR ===
+    stage.start('sidebar')
     st.sidebar.header("📊 Panel de Control")
     
     # Búsqueda simplificada
@@ -194,11 +203,42 @@ def main():
         'Country_encoded': country_options[country]
     }
     
-    prediction, probability = make_prediction(features, model, scaler, selector)
-    customer_data = {**features, 'probability': probability}
-    insights = generate_customer_insights(customer_data)
+    st.sidebar.markdown("---")
+    scoring_mode = st.sidebar.radio(
+        "🎚️ Modo de puntuación:",
+        ["🔒 Determinista", "🎲 Monte Carlo", "〰️ Una muestra con ruido"],
+        help=("Determinista: sin ruido y con caché compartida. "
+              "Monte Carlo: media e intervalo del 95% sobre réplicas con ruido. "
+              "Una muestra: comportamiento original, varía en cada ejecución")
+    )
+    probability_interval = None
+    stage.start('prediction', mode=scoring_mode)
+    
+    if scoring_mode == "🔒 Determinista":
+        cache = get_prediction_cache()
+        prediction, probability = cached_prediction(cache, features, model, scaler, selector)
+        customer_data = {**features, 'probability': probability}
+        insights = cached_insights(cache, customer_data, generate_customer_insights)
+        
+        stats = cache.stats()
+        st.sidebar.caption(
+            f"Caché: {stats['hits']} aciertos · {stats['misses']} fallos · "
+            f"{stats['hit_rate']:.0%} acierto · {stats['size']}/{stats['maxsize']} entradas"
+        )
+    elif scoring_mode == "🎲 Monte Carlo":
+        n_replicas = st.sidebar.slider("Réplicas Monte Carlo", 100, 1000, 300, step=100)
+        prediction, probability, probability_interval = make_prediction_monte_carlo(
+            features, model, scaler, selector, n_replicas=n_replicas
+        )
+        customer_data = {**features, 'probability': probability}
+        insights = generate_customer_insights(customer_data)
+    else:
+        prediction, probability = make_prediction(features, model, scaler, selector)
+        customer_data = {**features, 'probability': probability}
+        insights = generate_customer_insights(customer_data)
     
     # === DASHBOARD PRINCIPAL ===
+    stage.start('render.header')
     st.markdown(f"""
     <div style="background: linear-gradient(90deg, #f8f9fa 0%, #e9ecef 100%); 
                 padding: 1.5rem; border-radius: 10px; margin-bottom: 2rem; 
@@ -214,6 +254,7 @@ def main():
     """, unsafe_allow_html=True)
     
     # Métricas detalladas con mejor diseño
+    stage.start('render.metrics')
     st.markdown("### 📊 Análisis Detallado de Métricas")
     
     col1, col2, col3 = st.columns(3)
@@ -275,6 +316,8 @@ def main():
             delta=f"{(probability-0.5)*100:+.1f}% vs promedio",
             delta_color=delta_color
         )
+        if probability_interval is not None:
+            st.caption(f"IC 95%: {probability_interval[0]:.1%} – {probability_interval[1]:.1%}")
     with col2:
         st.metric(f"{insights['segment_icon']} Segmento del Cliente", insights['segment'])
     with col3:
@@ -284,6 +327,7 @@ def main():
         st.metric("⚠️ Nivel de Riesgo", insights['risk_level'])
     
     # Visualizaciones con colores mejorados
+    stage.start('render.charts')
     st.markdown("### 📈 Visualizaciones Interactivas")
     
     col_viz1, col_viz2 = st.columns(2)
@@ -369,6 +413,7 @@ def main():
     
     # Recomendaciones con mejor diseño
     st.markdown("---")
+    stage.start('render.recommendations')
     st.markdown(f"### 💼 Recomendaciones Estratégicas para {customer_id}")
     
     col_rec1, col_rec2 = st.columns([1, 1])
@@ -441,6 +486,7 @@ ROI ESPERADO: {insights['expected_roi']}
     
     # Comparación con benchmarks usando predicción ML
     st.markdown("---")
+    stage.start('render.benchmarks')
     st.markdown("### 📊 Comparación con Benchmarks + Predicción ML")
     
     # Incluir predicción ML en la comparación
@@ -535,6 +581,7 @@ ROI ESPERADO: {insights['expected_roi']}
         """, unsafe_allow_html=True)
 
     # Sección de Métricas de ML
+    stage.start('render.model_metrics')
     st.header("📊 Métricas y Evaluación de Modelos ML")
     
     # Crear tabs para organizar el contenido
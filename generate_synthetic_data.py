@@ -0,0 +1,44 @@
+"""
+Generación de transacciones sintéticas con el esquema de Online Retail para pruebas de carga
+
+Uso:
+    python generate_synthetic_data.py --rows 1000000
+    python generate_synthetic_data.py --rows 100000000 --output data/raw/synthetic_retail.parquet
+    python generate_synthetic_data.py --rows 5000000 --customers 50000 --seed 7 --output data/raw/synthetic.csv
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from config import RANDOM_STATE, RAW_DATA_DIR
+from utils.synthetic_data import DEFAULT_CHUNK_ROWS, write_online_retail
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Transacciones sintéticas de Online Retail")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Líneas de factura a generar")
+    parser.add_argument('--output', default=str(RAW_DATA_DIR / 'synthetic_online_retail.parquet'),
+                        help="Archivo .parquet o .csv de salida")
+    parser.add_argument('--customers', type=int, default=None,
+                        help="Clientes distintos (default: una por cada ~125 líneas)")
+    parser.add_argument('--products', type=int, default=3684, help="Productos distintos")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="Líneas por bloque")
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE, help="Semilla")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start = time.perf_counter()
+    result = write_online_retail(args.output, args.rows, chunk_rows=args.chunk_rows,
+                                 n_customers=args.customers, seed=args.seed,
+                                 n_products=args.products)
+    print(f"{result['rows']:,} líneas en {result['chunks']} bloques -> {result['path']} "
+          f"({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
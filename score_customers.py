@@ -0,0 +1,57 @@
+"""
+Puntuación masiva de la base de clientes y exportación para Tableau
+
+Uso:
+    python score_customers.py
+    python score_customers.py --input data/processed/customer_features_with_trends.parquet --chunksize 100000
+    python score_customers.py --monte-carlo 200 --seed 42
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from config import (
+    LOYALTY_SEGMENTS, MODELS_DIR, PROCESSED_DATA_DIR, REPORTS_DIR, TABLEAU_EXPORT_COLUMNS
+)
+from utils.batch_scoring import DEFAULT_CHUNKSIZE, load_model_artifacts, score_customer_file
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Puntuación masiva de fidelización para Tableau")
+    parser.add_argument('--input', default=str(PROCESSED_DATA_DIR / 'customer_features_with_trends.csv'),
+                        help="CSV o Parquet con las características de clientes")
+    parser.add_argument('--output', default=str(REPORTS_DIR / 'tableau_loyalty_export.csv'),
+                        help="CSV de salida para Tableau")
+    parser.add_argument('--models-dir', default=str(MODELS_DIR),
+                        help="Directorio con modelo, scaler y selector")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Filas por bloque")
+    parser.add_argument('--monte-carlo', type=int, default=0, metavar='K',
+                        help="Réplicas con ruido por cliente para la media e IC 95%% (0 = desactivado)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Semilla del ruido en modo Monte Carlo")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    model, scaler, selector = load_model_artifacts(args.models_dir)
+    stats = score_customer_file(
+        args.input, args.output, model, scaler, selector,
+        export_columns=TABLEAU_EXPORT_COLUMNS,
+        loyalty_segments=LOYALTY_SEGMENTS,
+        chunksize=args.chunksize,
+        monte_carlo_replicas=args.monte_carlo,
+        random_state=args.seed
+    )
+
+    print(f"Clientes puntuados: {stats['rows']:,}")
+    print(f"Tiempo total: {stats['seconds']:.2f} s ({stats['rows_per_second']:,.0f} filas/s)")
+    print(f"Exportación guardada en: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
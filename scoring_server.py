@@ -0,0 +1,56 @@
+"""
+Servicio HTTP local de puntuación de fidelización para integraciones (CRM)
+
+Uso:
+    python scoring_server.py --port 8000 --max-batch-size 256 --max-wait-ms 5
+
+Endpoints:
+    POST /score    Un cliente ({...}) o varios ([{...}, ...] o {"customers": [...]})
+    GET  /metrics  Percentiles de latencia y tamaño medio de lote
+    GET  /health   Estado del servicio
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from config import MODELS_DIR
+from utils.batch_scoring import load_model_artifacts
+from utils.scoring_service import MicroBatcher, ScoringServer
+from utils.tree_compiler import compile_tree_ensemble
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servicio HTTP de puntuación con micro-lotes")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--models-dir', default=str(MODELS_DIR))
+    parser.add_argument('--max-batch-size', type=int, default=256,
+                        help="Máximo de clientes por llamada al modelo")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="Espera máxima para completar un lote")
+    parser.add_argument('--compiled', action='store_true',
+                        help="Evaluar lotes pequeños con el ensemble compilado a arrays planos")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Los artefactos se cargan una sola vez al arrancar
+    model, scaler, selector = load_model_artifacts(args.models_dir)
+    if args.compiled:
+        model = compile_tree_ensemble(model)
+    batcher = MicroBatcher(model, scaler, selector,
+                           max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    try:
+        asyncio.run(ScoringServer(batcher, args.host, args.port).serve_forever())
+    except KeyboardInterrupt:
+        print("Servidor detenido")
+
+
+if __name__ == '__main__':
+    main()
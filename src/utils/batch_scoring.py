@@ -0,0 +1,187 @@
+"""
+Puntuación masiva de clientes y exportación para Tableau por bloques
+"""
+
+import pickle
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.scoring import (
+    MODEL_FEATURE_COLUMNS, assemble_feature_matrix, score_batch, score_batch_monte_carlo
+)
+
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Columnas añadidas a la exportación en modo Monte Carlo
+MONTE_CARLO_EXPORT_COLUMNS = ['Loyalty_Probability_Lower', 'Loyalty_Probability_Upper']
+
+
+def load_model_artifacts(models_dir='results/models'):
+    """
+    Carga modelo, scaler y selector entrenados
+
+    Args:
+        models_dir (str): Directorio con los archivos .pkl
+
+    Returns:
+        tuple: (model, scaler, selector)
+    """
+    models_dir = Path(models_dir)
+    with open(models_dir / 'best_loyalty_model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    with open(models_dir / 'feature_scaler.pkl', 'rb') as f:
+        scaler = pickle.load(f)
+    with open(models_dir / 'feature_selector.pkl', 'rb') as f:
+        selector = pickle.load(f)
+    return model, scaler, selector
+
+
+def _is_parquet(file_path):
+    return Path(file_path).suffix.lower() in ('.parquet', '.pq')
+
+
+def iter_customer_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """
+    Lee la base de clientes (CSV o Parquet) por bloques
+
+    Args:
+        file_path (str): Ruta al archivo
+        chunksize (int): Filas por bloque
+        columns (list): Columnas a leer (default: todas)
+
+    Yields:
+        pd.DataFrame: Bloque de clientes
+    """
+    if _is_parquet(file_path):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(file_path, chunksize=chunksize, usecols=columns)
+
+
+def build_country_encoding(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Codificación de Country equivalente a LabelEncoder sobre todo el archivo
+
+    Se hace una primera pasada leyendo solo la columna Country para que los
+    códigos no dependan de qué países aparecen en cada bloque.
+
+    Returns:
+        dict: País -> código
+    """
+    countries = set()
+    for chunk in iter_customer_chunks(file_path, chunksize, columns=['Country']):
+        countries.update(chunk['Country'].fillna('Unknown').unique())
+    return {country: code for code, country in enumerate(sorted(countries))}
+
+
+def prepare_feature_chunk(chunk, country_encoding):
+    """
+    Construye la matriz de características del modelo para un bloque
+
+    Los valores ausentes se completan con DEFAULT_FEATURE_VALUES, igual que
+    en la puntuación de un solo cliente (demo y servidor).
+
+    Args:
+        chunk (pd.DataFrame): Bloque de clientes
+        country_encoding (dict): País -> código
+
+    Returns:
+        np.ndarray: Características en el orden de MODEL_FEATURE_COLUMNS
+    """
+    features = chunk.reindex(columns=MODEL_FEATURE_COLUMNS)
+    if 'Country' in chunk.columns:
+        features['Country_encoded'] = chunk['Country'].fillna('Unknown').map(country_encoding)
+    return assemble_feature_matrix(features)
+
+
+def assign_loyalty_segment(probabilities, loyalty_segments):
+    """
+    Asigna el segmento de fidelización según los umbrales de probabilidad
+
+    Args:
+        probabilities (np.ndarray): Probabilidades de fidelización
+        loyalty_segments (dict): Segmento -> umbral mínimo (config.LOYALTY_SEGMENTS)
+
+    Returns:
+        np.ndarray: Nombre del segmento por cliente
+    """
+    ordered = sorted(loyalty_segments.items(), key=lambda item: item[1], reverse=True)
+    conditions = [probabilities >= threshold for _, threshold in ordered]
+    return np.select(conditions, [name for name, _ in ordered], default=ordered[-1][0])
+
+
+def score_customer_file(input_path, output_path, model, scaler, selector, export_columns,
+                        loyalty_segments, chunksize=DEFAULT_CHUNKSIZE, monte_carlo_replicas=0,
+                        noise_std=0.1, random_state=None):
+    """
+    Puntúa la base de clientes por bloques y escribe la exportación de Tableau
+
+    Cada bloque se transforma y predice como una matriz completa y se añade al
+    CSV de salida, de modo que la memoria queda acotada por chunksize.
+
+    Args:
+        input_path (str): customer_features_with_trends.csv o equivalente Parquet
+        output_path (str): CSV de salida
+        model: Clasificador entrenado
+        scaler: StandardScaler entrenado
+        selector: Selector de características entrenado
+        export_columns (list): Columnas de salida (config.TABLEAU_EXPORT_COLUMNS)
+        loyalty_segments (dict): Umbrales de segmento (config.LOYALTY_SEGMENTS)
+        chunksize (int): Filas por bloque
+        monte_carlo_replicas (int): Réplicas con ruido por cliente; si es > 0 la
+            probabilidad es la media Monte Carlo y se exportan además los límites
+            del intervalo del 95% (MONTE_CARLO_EXPORT_COLUMNS)
+        noise_std (float): Desviación del ruido en modo Monte Carlo
+        random_state (int): Semilla del ruido en modo Monte Carlo
+
+    Returns:
+        dict: Filas procesadas, segundos y filas por segundo
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    country_encoding = build_country_encoding(input_path, chunksize)
+    rng = np.random.default_rng(random_state)
+    if monte_carlo_replicas > 0:
+        export_columns = list(export_columns) + MONTE_CARLO_EXPORT_COLUMNS
+    n_rows = 0
+
+    with open(output_path, 'w', newline='', encoding='utf-8') as output:
+        for i, chunk in enumerate(iter_customer_chunks(input_path, chunksize)):
+            features = prepare_feature_chunk(chunk, country_encoding)
+            if monte_carlo_replicas > 0:
+                predictions, probabilities, lower, upper = score_batch_monte_carlo(
+                    features, model, scaler, selector, n_replicas=monte_carlo_replicas,
+                    noise_std=noise_std, random_state=rng
+                )
+                chunk = chunk.assign(Loyalty_Probability_Lower=lower,
+                                     Loyalty_Probability_Upper=upper)
+            else:
+                predictions, probabilities = score_batch(features, model, scaler, selector)
+
+            chunk = chunk.assign(
+                Loyalty_Prediction=predictions,
+                Loyalty_Probability=probabilities,
+                Loyalty_Segment=assign_loyalty_segment(probabilities, loyalty_segments)
+            )
+            chunk.reindex(columns=export_columns).to_csv(output, header=(i == 0), index=False)
+            n_rows += len(chunk)
+
+        if n_rows == 0:
+            pd.DataFrame(columns=export_columns).to_csv(output, index=False)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': n_rows,
+        'seconds': elapsed,
+        'rows_per_second': n_rows / elapsed if elapsed > 0 else float('inf')
+    }
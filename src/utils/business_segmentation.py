@@ -6,35 +6,69 @@ TFM: Predicción de Fidelización - Magda Monroy Jiménez
 import pandas as pd
 import numpy as np
 
+from utils.instrumentation import instrumented
+from utils.segmentation_batch import (
+    budget_allocation_batch, insights_batch, segment_batch, value_score_batch
+)
+
+# Icono y color de cada segmento, en el orden de evaluación de get_customer_segment
+SEGMENT_STYLES = {
+    "Champions": ("🏆", "#28a745"),
+    "Loyal Customers": ("💎", "#17a2b8"),
+    "Potential Loyalists": ("⭐", "#ffc107"),
+    "New Customers": ("🌱", "#6f42c1"),
+    "Promising": ("📈", "#fd7e14"),
+    "Need Attention": ("⚠️", "#dc3545"),
+    "At Risk": ("🚨", "#e83e8c"),
+    "Lost": ("💔", "#6c757d")
+}
+
+# Presupuesto base de campaña por segmento
+BASE_BUDGETS = {
+    "Champions": 50,
+    "Loyal Customers": 35,
+    "Potential Loyalists": 25,
+    "New Customers": 15,
+    "Promising": 20,
+    "Need Attention": 12,
+    "At Risk": 8,
+    "Lost": 3
+}
+
 def get_customer_segment(recency, frequency, monetary, probability):
     """
     Segmentación RFM + Probabilidad para recomendaciones de negocio
     """
-    
+    segment = _segment_name(recency, frequency, monetary, probability)
+    icon, color = SEGMENT_STYLES[segment]
+    return segment, icon, color
+
+def _segment_name(recency, frequency, monetary, probability):
+    """Nombre del segmento; el icono y el color salen de SEGMENT_STYLES"""
     # Segmentación RFM tradicional mejorada
     if recency <= 30 and frequency >= 8 and monetary >= 1000:
         if probability >= 0.8:
-            return "Champions", "🏆", "#28a745"
+            return "Champions"
         else:
-            return "Loyal Customers", "💎", "#17a2b8"
+            return "Loyal Customers"
     
     elif recency <= 60 and frequency >= 5 and monetary >= 500:
         if probability >= 0.7:
-            return "Potential Loyalists", "⭐", "#ffc107"
+            return "Potential Loyalists"
         else:
-            return "New Customers", "🌱", "#6f42c1"
+            return "New Customers"
     
     elif recency <= 90 and frequency >= 3:
         if probability >= 0.6:
-            return "Promising", "📈", "#fd7e14"
+            return "Promising"
         else:
-            return "Need Attention", "⚠️", "#dc3545"
+            return "Need Attention"
     
     elif recency > 90 and frequency >= 2:
-        return "At Risk", "🚨", "#e83e8c"
+        return "At Risk"
     
     else:
-        return "Lost", "💔", "#6c757d"
+        return "Lost"
 
 def get_business_recommendations(segment, recency, frequency, monetary, probability):
     """
@@ -172,18 +206,7 @@ def get_campaign_budget_allocation(segment, customer_value_score):
     """
     Sugerir presupuesto de campaña por cliente
     """
-    base_budgets = {
-        "Champions": 50,
-        "Loyal Customers": 35,
-        "Potential Loyalists": 25,
-        "New Customers": 15,
-        "Promising": 20,
-        "Need Attention": 12,
-        "At Risk": 8,
-        "Lost": 3
-    }
-    
-    base = base_budgets.get(segment, 5)
+    base = BASE_BUDGETS.get(segment, 5)
     
     # Ajustar por valor del cliente
     if customer_value_score >= 80:
@@ -197,6 +220,7 @@ def get_campaign_budget_allocation(segment, customer_value_score):
     
     return round(base * multiplier, 2)
 
+@instrumented
 def generate_customer_insights(customer_data):
     """
     Generar insights completos para un cliente
@@ -241,3 +265,43 @@ def generate_customer_insights(customer_data):
         "campaign_priority": recommendations["priority"],
         "expected_roi": recommendations["roi_expected"]
     }
+
+# === Versiones vectorizadas para segmentar poblaciones completas ===
+
+@instrumented
+def get_customer_segment_batch(recency, frequency, monetary, probability):
+    """
+    Segmentación RFM + Probabilidad para arrays de clientes
+    
+    Returns:
+        tuple: (segmentos, iconos, colores) como arrays de objetos
+    """
+    return segment_batch(recency, frequency, monetary, probability, SEGMENT_STYLES)
+
+@instrumented
+def calculate_customer_value_score_batch(recency, frequency, monetary, probability):
+    """
+    Calcular score de valor (0-100) para arrays de clientes
+    """
+    return value_score_batch(recency, frequency, monetary, probability)
+
+@instrumented
+def get_campaign_budget_allocation_batch(segments, customer_value_scores):
+    """
+    Sugerir presupuesto de campaña para arrays de clientes
+    """
+    return budget_allocation_batch(segments, customer_value_scores, BASE_BUDGETS)
+
+@instrumented
+def generate_customer_insights_batch(customers):
+    """
+    Generar insights para todos los clientes de un DataFrame en una sola llamada
+    
+    Args:
+        customers (pd.DataFrame): Columnas Recency, Frequency, Monetary y
+            opcionalmente probability (default 0.5)
+        
+    Returns:
+        pd.DataFrame: Segmento, score de valor, riesgo y presupuesto por cliente
+    """
+    return insights_batch(customers, SEGMENT_STYLES, BASE_BUDGETS, get_business_recommendations)
@@ -6,35 +6,69 @@ TFM: Predicción de Fidelización - Magda Monroy Jiménez
 import pandas as pd
 import numpy as np
 
+from utils.instrumentation import instrumented
+from utils.segmentation_batch import (
+    budget_allocation_batch, insights_batch, segment_batch, value_score_batch
+)
+
+# Icono y color de cada segmento, en el orden de evaluación de get_customer_segment
+SEGMENT_STYLES = {
+    "Campeones": ("🏆", "#28a745"),  # Verde success
+    "Clientes Leales": ("💎", "#17a2b8"),  # Azul info
+    "Potenciales Leales": ("⭐", "#ffc107"),  # Amarillo warning
+    "Nuevos Clientes": ("🌱", "#6f42c1"),  # Púrpura
+    "Prometedores": ("📈", "#fd7e14"),  # Naranja
+    "Necesitan Atención": ("⚠️", "#dc3545"),  # Rojo danger
+    "En Riesgo": ("🚨", "#e83e8c"),  # Rosa
+    "Perdidos": ("💔", "#6c757d")  # Gris secondary
+}
+
+# Presupuesto base de campaña por segmento
+BASE_BUDGETS = {
+    "Campeones": 50,
+    "Clientes Leales": 35,
+    "Potenciales Leales": 25,
+    "Nuevos Clientes": 15,
+    "Prometedores": 20,
+    "Necesitan Atención": 12,
+    "En Riesgo": 8,
+    "Perdidos": 3
+}
+
 def get_customer_segment(recency, frequency, monetary, probability):
     """
     Segmentación RFM + Probabilidad con paleta original que funcionaba bien
     """
-    
+    segment = _segment_name(recency, frequency, monetary, probability)
+    icon, color = SEGMENT_STYLES[segment]
+    return segment, icon, color
+
+def _segment_name(recency, frequency, monetary, probability):
+    """Nombre del segmento; el icono y el color salen de SEGMENT_STYLES"""
     # Segmentación RFM con colores originales consistentes
     if recency <= 30 and frequency >= 8 and monetary >= 1000:
         if probability >= 0.8:
-            return "Campeones", "🏆", "#28a745"  # Verde success
+            return "Campeones"
         else:
-            return "Clientes Leales", "💎", "#17a2b8"  # Azul info
+            return "Clientes Leales"
     
     elif recency <= 60 and frequency >= 5 and monetary >= 500:
         if probability >= 0.7:
-            return "Potenciales Leales", "⭐", "#ffc107"  # Amarillo warning
+            return "Potenciales Leales"
         else:
-            return "Nuevos Clientes", "🌱", "#6f42c1"  # Púrpura
+            return "Nuevos Clientes"
     
     elif recency <= 90 and frequency >= 3:
         if probability >= 0.6:
-            return "Prometedores", "📈", "#fd7e14"  # Naranja
+            return "Prometedores"
         else:
-            return "Necesitan Atención", "⚠️", "#dc3545"  # Rojo danger
+            return "Necesitan Atención"
     
     elif recency > 90 and frequency >= 2:
-        return "En Riesgo", "🚨", "#e83e8c"  # Rosa
+        return "En Riesgo"
     
     else:
-        return "Perdidos", "💔", "#6c757d"  # Gris secondary
+        return "Perdidos"
 
 def get_business_recommendations(segment, recency, frequency, monetary, probability):
     """
@@ -172,18 +206,7 @@ def get_campaign_budget_allocation(segment, customer_value_score):
     """
     Sugerir presupuesto de campaña por cliente
     """
-    base_budgets = {
-        "Campeones": 50,
-        "Clientes Leales": 35,
-        "Potenciales Leales": 25,
-        "Nuevos Clientes": 15,
-        "Prometedores": 20,
-        "Necesitan Atención": 12,
-        "En Riesgo": 8,
-        "Perdidos": 3
-    }
-    
-    base = base_budgets.get(segment, 5)
+    base = BASE_BUDGETS.get(segment, 5)
     
     # Ajustar por valor del cliente
     if customer_value_score >= 80:
@@ -197,6 +220,7 @@ def get_campaign_budget_allocation(segment, customer_value_score):
     
     return round(base * multiplier, 2)
 
+@instrumented
 def generate_customer_insights(customer_data):
     """
     Generar insights completos para un cliente
@@ -241,3 +265,43 @@ def generate_customer_insights(customer_data):
         "campaign_priority": recommendations["priority"],
         "expected_roi": recommendations["roi_expected"]
     }
+
+# === Versiones vectorizadas para segmentar poblaciones completas ===
+
+@instrumented
+def get_customer_segment_batch(recency, frequency, monetary, probability):
+    """
+    Segmentación RFM + Probabilidad para arrays de clientes
+    
+    Returns:
+        tuple: (segmentos, iconos, colores) como arrays de objetos
+    """
+    return segment_batch(recency, frequency, monetary, probability, SEGMENT_STYLES)
+
+@instrumented
+def calculate_customer_value_score_batch(recency, frequency, monetary, probability):
+    """
+    Calcular puntuación de valor (0-100) para arrays de clientes
+    """
+    return value_score_batch(recency, frequency, monetary, probability)
+
+@instrumented
+def get_campaign_budget_allocation_batch(segments, customer_value_scores):
+    """
+    Sugerir presupuesto de campaña para arrays de clientes
+    """
+    return budget_allocation_batch(segments, customer_value_scores, BASE_BUDGETS)
+
+@instrumented
+def generate_customer_insights_batch(customers):
+    """
+    Generar insights para todos los clientes de un DataFrame en una sola llamada
+    
+    Args:
+        customers (pd.DataFrame): Columnas Recency, Frequency, Monetary y
+            opcionalmente probability (default 0.5)
+        
+    Returns:
+        pd.DataFrame: Segmento, puntuación de valor, riesgo y presupuesto por cliente
+    """
+    return insights_batch(customers, SEGMENT_STYLES, BASE_BUDGETS, get_business_recommendations)
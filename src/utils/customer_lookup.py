@@ -3,106 +3,365 @@ Funcionalidad de búsqueda de clientes reales
 TFM: Predicción de Fidelización - Magda Monroy Jiménez
 """
 
+import os
+import threading
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from utils.instrumentation import instrumented
+
+CUSTOMER_DATABASE_PATH = 'data/processed/customer_features_with_trends.csv'
+
+class CustomerStore:
+    """
+    Base de clientes en memoria con índice hash por CustomerID
+    
+    Se carga una sola vez por proceso y se recarga automáticamente cuando
+    cambia la fecha de modificación o el tamaño del archivo. Mantiene además
+    los rankings precalculados por valor monetario y de clientes en riesgo
+    para responder consultas top-N sin recorrer la tabla.
+    
+    La tabla cargada no se modifica nunca: update_customer guarda los cambios
+    aparte (copy-on-write) y la propiedad df materializa una copia nueva solo
+    cuando se lee después de una actualización, así que los DataFrames ya
+    entregados a otros llamadores no cambian.
+    
+    Con median_tolerance=0 (por defecto) los clientes en riesgo coinciden
+    siempre con el criterio exacto; un valor positivo (p. ej. 0.01) evita
+    recalcular los rankings de riesgo mientras la mediana de Monetary no se
+    aleje más de esa fracción, a costa de resultados aproximados.
+    """
+    
+    def __init__(self, path=CUSTOMER_DATABASE_PATH, median_tolerance=0.0):
+        self.path = Path(path)
+        self.median_tolerance = median_tolerance
+        self._lock = threading.RLock()
+        self._signature = None
+        self._base_df = None
+        self._df = None
+        self._overrides = {}
+        self._appended = []
+        self._n_rows = 0
+        self._positions = {}
+        self._monetary = np.empty(0)
+        self._recency = np.empty(0)
+        self._monetary_order = np.empty(0, dtype=np.int64)
+        self._monetary_median = np.nan
+        self._median_stale = False
+        self._at_risk_orders = {}
+    
+    def _file_signature(self):
+        """Firma del archivo (mtime, tamaño) o None si no existe"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    @instrumented
+    def _load(self, signature):
+        """Leer el CSV y reconstruir el índice y los rankings"""
+        df = pd.read_csv(self.path)
+        
+        # Índice CustomerID -> posición; ante duplicados gana la primera fila
+        ids = df['CustomerID'].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(ids)
+        positions = np.flatnonzero(valid)[::-1]
+        self._positions = dict(zip(ids[positions].astype(np.int64).tolist(), positions.tolist()))
+        
+        self._base_df = self._df = df
+        self._overrides = {}
+        self._appended = []
+        self._n_rows = len(df)
+        self._signature = signature
+        self._build_rankings()
+    
+    def _build_rankings(self):
+        """Ordenar posiciones por Monetary descendente (empates por orden de fila, como nlargest)"""
+        self._monetary = self._base_df['Monetary'].to_numpy(dtype=np.float64).copy()
+        self._recency = self._base_df['Recency'].to_numpy(dtype=np.float64).copy()
+        
+        order = np.argsort(-self._monetary, kind='stable')
+        self._monetary_order = order[~np.isnan(self._monetary[order])]
+        self._monetary_median = np.nanmedian(self._monetary) if len(self._monetary) else np.nan
+        self._median_stale = False
+        self._at_risk_orders = {}
+    
+    def refresh(self):
+        """Recargar si el archivo ha cambiado desde la última carga"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        
+        with self._lock:
+            if signature == self._signature:
+                return
+            if signature is None:
+                self._base_df, self._df, self._positions, self._signature = None, None, {}, None
+                self._overrides, self._appended, self._n_rows = {}, [], 0
+                self._monetary_order = np.empty(0, dtype=np.int64)
+                self._at_risk_orders = {}
+            else:
+                self._load(signature)
+    
+    def _frame(self):
+        """Tabla actual; tras una actualización se materializa una copia nueva una sola vez"""
+        if self._df is None and self._base_df is not None:
+            df = self._base_df
+            if self._overrides:
+                df = df.copy()
+                for position, values in self._overrides.items():
+                    for col, value in values.items():
+                        df.iloc[position, df.columns.get_loc(col)] = value
+            if self._appended:
+                df = pd.concat([df, pd.DataFrame(self._appended, columns=df.columns)],
+                               ignore_index=True)
+            self._df = df
+        return self._df
+    
+    @property
+    def df(self):
+        """DataFrame de clientes (solo lectura) o None si no hay archivo"""
+        self.refresh()
+        with self._lock:
+            return self._frame()
+    
+    @instrumented
+    def get(self, customer_id):
+        """Fila del cliente como diccionario o None"""
+        self.refresh()
+        with self._lock:
+            base = self._base_df
+            position = self._positions.get(int(customer_id))
+            if base is None or position is None:
+                return None
+            if position >= len(base):
+                return dict(self._appended[position - len(base)])
+            row = base.iloc[position].to_dict()
+            row.update(self._overrides.get(position, {}))
+            return row
+    
+    @instrumented
+    def top_by_monetary(self, n):
+        """Posiciones de los n clientes con mayor Monetary"""
+        self.refresh()
+        return self._monetary_order[:max(n, 0)]
+    
+    def _is_at_risk(self, positions, recency_threshold):
+        """Criterio de riesgo: recencia alta y valor por encima de la mediana"""
+        return ((self._recency[positions] > recency_threshold) &
+                (self._monetary[positions] > self._monetary_median))
+    
+    def _check_median(self):
+        """
+        Recalcular la mediana de Monetary tras actualizaciones (una vez por consulta)
+        
+        Los rankings de riesgo se descartan cuando la mediana real se aleja
+        más de median_tolerance (relativa) de la usada para calcularlos; con
+        tolerancia 0, en cuanto cambia.
+        """
+        if not self._median_stale:
+            return
+        self._median_stale = False
+        median = np.nanmedian(self._monetary[:self._n_rows]) if self._n_rows else np.nan
+        if np.isnan(median) or np.isnan(self._monetary_median):
+            drifted = not (np.isnan(median) and np.isnan(self._monetary_median))
+        else:
+            drifted = abs(median - self._monetary_median) > self.median_tolerance * abs(self._monetary_median)
+        if drifted:
+            self._monetary_median = median
+            self._at_risk_orders = {}
+    
+    @instrumented
+    def top_at_risk(self, n, recency_threshold=90):
+        """Posiciones de los n clientes en riesgo con mayor Monetary"""
+        self.refresh()
+        with self._lock:
+            self._check_median()
+            order = self._at_risk_orders.get(recency_threshold)
+            if order is None:
+                candidates = self._monetary_order
+                order = candidates[self._is_at_risk(candidates, recency_threshold)]
+                self._at_risk_orders[recency_threshold] = order
+        return order[:max(n, 0)]
+    
+    def top_by_monetary_rows(self, n):
+        """Filas de los n clientes con mayor Monetary (tabla y posiciones de la misma versión)"""
+        with self._lock:
+            positions = self.top_by_monetary(n)
+            df = self._frame()
+            return None if df is None else df.iloc[positions]
+    
+    def top_at_risk_rows(self, n, recency_threshold=90):
+        """Filas de los n clientes en riesgo con mayor Monetary (tabla y posiciones de la misma versión)"""
+        with self._lock:
+            positions = self.top_at_risk(n, recency_threshold)
+            df = self._frame()
+            return None if df is None else df.iloc[positions]
+    
+    def _insertion_point(self, order, position):
+        """Posición de inserción en un ranking ordenado por (-Monetary, fila)"""
+        keys = -self._monetary[order]
+        key = -self._monetary[position]
+        low = np.searchsorted(keys, key, side='left')
+        high = np.searchsorted(keys, key, side='right')
+        return low + np.searchsorted(order[low:high], position)
+    
+    def _reposition(self, order, position, include):
+        """Quitar y volver a insertar una fila en un ranking"""
+        order = order[order != position]
+        if include and not np.isnan(self._monetary[position]):
+            order = np.insert(order, self._insertion_point(order, position), position)
+        return order
+    
+    def _grow(self, required):
+        """Ampliar los arrays de Monetary/Recency duplicando capacidad"""
+        capacity = len(self._monetary)
+        if required <= capacity:
+            return
+        capacity = max(required, 2 * capacity)
+        for name in ('_monetary', '_recency'):
+            grown = np.full(capacity, np.nan)
+            grown[:self._n_rows] = getattr(self, name)[:self._n_rows]
+            setattr(self, name, grown)
+    
+    @instrumented
+    def update_customer(self, record):
+        """
+        Actualiza (o añade) un cliente y mantiene los rankings de forma incremental
+        
+        El cambio se guarda aparte de la tabla cargada (sin copiarla) y solo se
+        recoloca la fila modificada en cada ranking mediante búsqueda binaria.
+        Los rankings de riesgo usan una mediana de Monetary fijada que se
+        revisa en la siguiente consulta (ver _check_median). El coste por
+        llamada es O(log n) más el desplazamiento de memoria de np.insert en
+        los rankings. Los cambios se mantienen en memoria hasta que se recarga
+        el archivo.
+        
+        Args:
+            record (dict): Campos del cliente; debe incluir CustomerID
+        """
+        self.refresh()
+        with self._lock:
+            if self._base_df is None:
+                raise ValueError(f"Base de clientes no disponible: {self.path}")
+            
+            columns = self._base_df.columns
+            customer_id = int(record['CustomerID'])
+            position = self._positions.get(customer_id)
+            values = {col: record[col] for col in record if col in columns}
+            n_base = len(self._base_df)
+            
+            if position is None:
+                # Alta de cliente: se añade al final de la tabla
+                position = self._n_rows
+                self._appended.append({col: values.get(col, np.nan) for col in columns})
+                self._positions[customer_id] = position
+                self._grow(position + 1)
+                self._n_rows += 1
+            elif position >= n_base:
+                self._appended[position - n_base].update(values)
+            else:
+                self._overrides.setdefault(position, {}).update(values)
+            self._df = None
+            
+            if 'Monetary' in values:
+                self._monetary[position] = float(values['Monetary'])
+                self._monetary_order = self._reposition(self._monetary_order, position, True)
+                self._median_stale = True
+            if 'Recency' in values:
+                self._recency[position] = float(values['Recency'])
+            
+            for threshold, order in self._at_risk_orders.items():
+                include = bool(self._is_at_risk(np.array([position]), threshold)[0])
+                self._at_risk_orders[threshold] = self._reposition(order, position, include)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_customer_store(path=CUSTOMER_DATABASE_PATH):
+    """Obtener el almacén de clientes compartido por el proceso"""
+    key = os.path.abspath(path)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, CustomerStore(path))
+    return store
+
 def load_customer_database():
     """Cargar base de datos de clientes"""
-    try:
-        df = pd.read_csv('data/processed/customer_features_with_trends.csv')
-        return df
-    except FileNotFoundError:
-        return None
+    return get_customer_store().df
 
+@instrumented
 def search_customer_by_id(customer_id):
     """Buscar cliente por ID"""
-    df = load_customer_database()
-    if df is None:
-        return None
+    store = get_customer_store()
     
     # Buscar por CustomerID exacto o parcial
     if customer_id.isdigit():
         # Búsqueda por ID numérico
-        customer = df[df['CustomerID'] == int(customer_id)]
-    else:
-        # Búsqueda por string (puede incluir CUST- prefix)
-        numeric_id = ''.join(filter(str.isdigit, customer_id))
-        if numeric_id:
-            customer = df[df['CustomerID'] == int(numeric_id)]
-        else:
-            return None
+        return store.get(int(customer_id))
     
-    if len(customer) > 0:
-        return customer.iloc[0].to_dict()
+    # Búsqueda por string (puede incluir CUST- prefix)
+    numeric_id = ''.join(filter(str.isdigit, customer_id))
+    if numeric_id:
+        return store.get(int(numeric_id))
     return None
 
+def _customer_summaries(rows):
+    """Convertir filas de clientes en diccionarios para la demo (sin iterrows)"""
+    countries = rows['Country'] if 'Country' in rows.columns else ['Unknown'] * len(rows)
+    
+    return [
+        {
+            'id': f"CUST-{customer_id}",
+            'recency': int(recency),
+            'frequency': int(frequency),
+            'monetary': int(monetary),
+            'unique_products': int(unique_products),
+            'country': country
+        }
+        for customer_id, recency, frequency, monetary, unique_products, country in zip(
+            rows['CustomerID'], rows['Recency'], rows['Frequency'],
+            rows['Monetary'], rows['UniqueProducts'], countries
+        )
+    ]
+
+@instrumented
 def get_random_customers(n=5):
     """Obtener clientes aleatorios para demo"""
     df = load_customer_database()
     if df is None:
         return []
     
-    sample = df.sample(min(n, len(df)))
-    customers = []
-    
-    for _, row in sample.iterrows():
-        customers.append({
-            'id': f"CUST-{row['CustomerID']}",
-            'recency': int(row['Recency']),
-            'frequency': int(row['Frequency']),
-            'monetary': int(row['Monetary']),
-            'unique_products': int(row['UniqueProducts']),
-            'country': row.get('Country', 'Unknown')
-        })
-    
-    return customers
+    return _customer_summaries(df.sample(min(n, len(df))))
 
+@instrumented
 def get_top_customers_by_value(n=10):
     """Obtener top clientes por valor monetario"""
-    df = load_customer_database()
-    if df is None:
+    top = get_customer_store().top_by_monetary_rows(n)
+    if top is None:
         return []
     
-    top_customers = df.nlargest(n, 'Monetary')
-    customers = []
-    
-    for _, row in top_customers.iterrows():
-        customers.append({
-            'id': f"CUST-{row['CustomerID']}",
-            'recency': int(row['Recency']),
-            'frequency': int(row['Frequency']),
-            'monetary': int(row['Monetary']),
-            'unique_products': int(row['UniqueProducts']),
-            'country': row.get('Country', 'Unknown'),
-            'rank': len(customers) + 1
-        })
+    customers = _customer_summaries(top)
+    for rank, customer in enumerate(customers, start=1):
+        customer['rank'] = rank
     
     return customers
 
-def get_customers_at_risk(n=10):
+@instrumented
+def get_customers_at_risk(n=10, recency_threshold=90):
     """Obtener clientes en riesgo con alto valor histórico"""
-    df = load_customer_database()
-    if df is None:
+    # Clientes con alta recencia pero buen valor histórico
+    at_risk = get_customer_store().top_at_risk_rows(n, recency_threshold)
+    if at_risk is None:
         return []
     
-    # Clientes con alta recencia pero buen valor histórico
-    at_risk = df[
-        (df['Recency'] > 90) & 
-        (df['Monetary'] > df['Monetary'].median())
-    ].nlargest(n, 'Monetary')
-    
-    customers = []
-    for _, row in at_risk.iterrows():
-        customers.append({
-            'id': f"CUST-{row['CustomerID']}",
-            'recency': int(row['Recency']),
-            'frequency': int(row['Frequency']),
-            'monetary': int(row['Monetary']),
-            'unique_products': int(row['UniqueProducts']),
-            'country': row.get('Country', 'Unknown'),
-            'risk_score': row['Recency']  # Usar recency como score de riesgo
-        })
+    customers = _customer_summaries(at_risk)
+    for customer, recency in zip(customers, at_risk['Recency']):
+        customer['risk_score'] = recency  # Usar recency como score de riesgo
     
     return customers
 
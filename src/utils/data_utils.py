@@ -2,12 +2,67 @@
 Utilidades para procesamiento de datos del proyecto de fidelización
 """
 
+import glob
+import hashlib
+import json
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 
+from utils.instrumentation import instrumented
+
+
+# Reglas de limpieza del dataset Online Retail. Forman parte de la huella
+# de la caché: cualquier cambio aquí invalida los ficheros cacheados.
+CLEANING_RULES = {
+    'required_columns': ['CustomerID'],
+    'cancelled_invoice_prefix': 'C',
+    'min_quantity_exclusive': 0,
+    'min_unit_price_exclusive': 0,
+    'revenue': 'Quantity * UnitPrice',
+    'version': 1
+}
+
+# Columnas con tipos mixtos (int/str) en el Excel original que se guardan
+# como texto para poder escribirlas en formato columnar
+CACHE_TEXT_COLUMNS = ['InvoiceNo', 'StockCode', 'Description']
+
+DEFAULT_CACHE_DIR = 'data/processed/cache'
+
+
+@instrumented
+def clean_retail_data(df, rules=None):
+    """
+    Aplica las reglas de limpieza a un DataFrame de transacciones
+    
+    El DataFrame recibido no se modifica.
+    
+    Args:
+        df (pd.DataFrame): Transacciones en bruto
+        rules (dict): Reglas de limpieza (default: CLEANING_RULES)
+        
+    Returns:
+        pd.DataFrame: Transacciones limpias con columna Revenue
+    """
+    rules = rules or CLEANING_RULES
+    
+    # Limpieza básica
+    df_clean = df.dropna(subset=rules['required_columns'])
+    df_clean = df_clean[~df_clean['InvoiceNo'].astype(str).str.startswith(rules['cancelled_invoice_prefix'])]
+    df_clean = df_clean[df_clean['Quantity'] > rules['min_quantity_exclusive']]
+    df_clean = df_clean[df_clean['UnitPrice'] > rules['min_unit_price_exclusive']]
+    
+    # Convertir fecha y crear variable de ingresos (sobre una copia nueva)
+    return df_clean.assign(
+        InvoiceDate=pd.to_datetime(df_clean['InvoiceDate']),
+        Revenue=df_clean['Quantity'] * df_clean['UnitPrice']
+    )
+
 
+@instrumented
 def load_and_clean_retail_data(file_path):
     """
     Carga y limpia el dataset Online Retail
@@ -21,21 +76,118 @@ def load_and_clean_retail_data(file_path):
     # Cargar datos
     df = pd.read_excel(file_path)
     
-    # Convertir fecha
-    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'])
+    return normalize_text_columns(clean_retail_data(df))
+
+
+def normalize_text_columns(df):
+    """
+    Convierte a texto las columnas de tipo mixto (CACHE_TEXT_COLUMNS)
+    
+    Se aplica igual con y sin caché para que ambas rutas devuelvan los
+    mismos tipos; los valores ausentes se mantienen.
     
-    # Limpieza básica
-    df_clean = df.dropna(subset=['CustomerID'])
-    df_clean = df_clean[~df_clean['InvoiceNo'].astype(str).str.startswith('C')]
-    df_clean = df_clean[df_clean['Quantity'] > 0]
-    df_clean = df_clean[df_clean['UnitPrice'] > 0]
+    Args:
+        df (pd.DataFrame): Transacciones
+        
+    Returns:
+        pd.DataFrame: Transacciones con InvoiceNo, StockCode y Description como texto
+    """
+    columns = [col for col in CACHE_TEXT_COLUMNS if col in df.columns]
+    return df.assign(**{
+        col: df[col].where(df[col].isna(), df[col].astype(str)).astype(object) for col in columns
+    })
+
+
+def compute_file_fingerprint(file_path, block_size=1 << 20):
+    """
+    Calcula la huella SHA-256 del contenido de un archivo
     
-    # Crear variable de ingresos
-    df_clean['Revenue'] = df_clean['Quantity'] * df_clean['UnitPrice']
+    Args:
+        file_path (str): Ruta al archivo
+        block_size (int): Tamaño de bloque de lectura en bytes
+        
+    Returns:
+        str: Huella hexadecimal
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_cache_key(file_path, rules=None):
+    """
+    Obtiene la clave de caché a partir del archivo fuente y las reglas de limpieza
+    
+    Args:
+        file_path (str): Ruta al archivo fuente
+        rules (dict): Reglas de limpieza (default: CLEANING_RULES)
+        
+    Returns:
+        str: Clave de caché
+    """
+    rules = rules or CLEANING_RULES
+    rules_json = json.dumps(rules, sort_keys=True)
+    
+    digest = hashlib.sha256()
+    digest.update(compute_file_fingerprint(file_path).encode())
+    digest.update(rules_json.encode())
+    return digest.hexdigest()[:32]
+
+
+@instrumented
+def load_and_clean_retail_data_cached(file_path, cache_dir=DEFAULT_CACHE_DIR, rules=None,
+                                      refresh=False):
+    """
+    Carga el dataset Online Retail limpio usando una caché en Parquet
+    
+    La primera llamada lee el Excel, aplica la limpieza y guarda el resultado
+    en Parquet. Las llamadas siguientes leen directamente el Parquet mientras
+    no cambien ni el archivo fuente ni las reglas de limpieza.
+    
+    Args:
+        file_path (str): Ruta al archivo Excel
+        cache_dir (str): Directorio de la caché
+        rules (dict): Reglas de limpieza (default: CLEANING_RULES)
+        refresh (bool): Ignorar la caché existente y regenerarla
+        
+    Returns:
+        pd.DataFrame: Dataset limpio
+    """
+    rules = rules or CLEANING_RULES
+    cache_dir = Path(cache_dir)
+    source_name = Path(file_path).stem
+    cache_file = cache_dir / f"{source_name}_{get_cache_key(file_path, rules)}.parquet"
+    
+    if cache_file.exists() and not refresh:
+        try:
+            return normalize_text_columns(pd.read_parquet(cache_file))
+        except Exception as e:
+            print(f"Caché ilegible, se regenera ({cache_file.name}): {e}")
+    
+    # Columnas de tipo mixto como texto para el formato columnar
+    df_clean = normalize_text_columns(clean_retail_data(pd.read_excel(file_path), rules))
+    
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Eliminar versiones anteriores de la caché del mismo archivo (solo
+        # "<nombre>_<clave de 32 hex>", no las de otros archivos con el mismo prefijo)
+        for stale in cache_dir.glob(f"{glob.escape(source_name)}_{'[0-9a-f]' * 32}.parquet"):
+            stale.unlink()
+        
+        # Escritura atómica para no dejar cachés a medias
+        tmp_file = cache_file.with_suffix('.parquet.tmp')
+        df_clean.to_parquet(tmp_file, index=True)
+        tmp_file.replace(cache_file)
+    except Exception as e:
+        print(f"No se pudo escribir la caché ({cache_file.name}): {e}")
     
     return df_clean
 
 
+@instrumented
 def calculate_rfm_metrics(df, customer_col='CustomerID', date_col='InvoiceDate', 
                          revenue_col='Revenue', invoice_col='InvoiceNo'):
     """
@@ -64,6 +216,7 @@ def calculate_rfm_metrics(df, customer_col='CustomerID', date_col='InvoiceDate',
     return rfm
 
 
+@instrumented
 def create_customer_features(df, customer_col='CustomerID'):
     """
     Crea características adicionales por cliente
@@ -95,6 +248,7 @@ def create_customer_features(df, customer_col='CustomerID'):
     return features
 
 
+@instrumented
 def define_loyalty_target(df, freq_threshold=3, monetary_percentile=0.25, recency_percentile=0.75):
     """
     Define la variable objetivo de fidelización
@@ -120,6 +274,7 @@ def define_loyalty_target(df, freq_threshold=3, monetary_percentile=0.25, recenc
     return is_loyal
 
 
+@instrumented
 def prepare_features_for_modeling(df, categorical_cols=None):
     """
     Prepara características para modelado
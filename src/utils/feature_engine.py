@@ -0,0 +1,233 @@
+"""
+Constructor unificado de características por cliente en una sola pasada
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import define_loyalty_target
+from utils.rfm_engine import (
+    NS_PER_DAY, datetime_to_ns, factorize_keys, group_max, group_min, group_nunique
+)
+
+
+# Esquema de data/processed/customer_features.csv
+CUSTOMER_FEATURES_COLUMNS = [
+    'CustomerID', 'Recency', 'Frequency', 'Monetary',
+    'TotalQuantity', 'AvgQuantity', 'StdQuantity',
+    'AvgUnitPrice', 'StdUnitPrice', 'AvgRevenue', 'StdRevenue',
+    'UniqueProducts', 'CustomerLifespan', 'Country', 'IsLoyal'
+]
+
+
+def _group_mean_std(codes, values, counts):
+    """Media y desviación típica muestral (ddof=1) por grupo en dos pasadas"""
+    n_groups = len(counts)
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        deviations = values - means[codes]
+        squares = np.bincount(codes, weights=deviations * deviations, minlength=n_groups)
+        stds = np.sqrt(squares / (counts - 1))
+
+    stds[counts < 2] = np.nan
+    return sums, means, stds
+
+
+def _group_mode(codes, value_codes, values, n_groups, default='Unknown'):
+    """
+    Moda por grupo; en caso de empate devuelve el menor valor como Series.mode()
+
+    value_codes debe provenir de una factorización ordenada de values.
+    """
+    result = np.full(n_groups, default, dtype=object)
+    valid = value_codes >= 0
+    if not valid.any():
+        return result
+
+    n_values = len(values)
+    pair_keys, pair_counts = np.unique(codes[valid] * n_values + value_codes[valid],
+                                       return_counts=True)
+    pair_groups = pair_keys // n_values
+    pair_values = pair_keys % n_values
+
+    # Orden estable: grupo, frecuencia descendente y valor ascendente
+    order = np.lexsort((-pair_counts, pair_groups))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair_groups[order][1:] != pair_groups[order][:-1]
+    winners = order[first]
+
+    result[pair_groups[winners]] = np.asarray(values, dtype=object)[pair_values[winners]]
+    return result
+
+
+def _month_codes(dates_ns):
+    """Meses desde 1970 a partir de fechas int64 en nanosegundos"""
+    return dates_ns.view('datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+
+def _month_labels(month_codes):
+    """Etiquetas 'YYYY-MM' para códigos de mes"""
+    return np.datetime_as_string(month_codes.astype('datetime64[M]'), unit='M')
+
+
+def _trends_month_codes(trends_monthly):
+    """Códigos de mes de la columna year_month de aggregate_trends_monthly"""
+    year_month = pd.to_datetime(trends_monthly['year_month'].astype(str), format='%Y-%m')
+    return year_month.to_numpy(dtype='datetime64[M]').astype(np.int64)
+
+
+def _customer_trends_features(pair_customers, pair_months, trends_monthly, n_customers):
+    """
+    Media, desviación típica y máximo de cada tendencia en los meses activos
+
+    Equivale a unir la actividad cliente-mes con las tendencias mensuales y
+    agregar por cliente ignorando los meses sin datos de tendencias.
+    """
+    trends_columns = [col for col in trends_monthly.columns if col.startswith('trends_')]
+    trend_months = _trends_month_codes(trends_monthly)
+
+    # Posición de cada mes activo en la tabla de tendencias (-1 si falta)
+    month_order = np.argsort(trend_months, kind='stable')
+    sorted_months = trend_months[month_order]
+    position = np.searchsorted(sorted_months, pair_months)
+    position = np.minimum(position, max(len(sorted_months) - 1, 0))
+    found = (len(sorted_months) > 0) & (sorted_months[position] == pair_months)
+    trend_rows = np.where(found, month_order[position], -1)
+
+    features = {}
+    for col in trends_columns:
+        column_values = trends_monthly[col].to_numpy(dtype=np.float64)
+        values = np.where(trend_rows >= 0, column_values[trend_rows], np.nan)
+        mask = ~np.isnan(values)
+
+        codes = pair_customers[mask]
+        observed = values[mask]
+        counts = np.bincount(codes, minlength=n_customers).astype(np.float64)
+        _, means, stds = _group_mean_std(codes, observed, counts)
+
+        maxima = np.full(n_customers, -np.inf)
+        np.maximum.at(maxima, codes, observed)
+
+        means[counts == 0] = np.nan
+        maxima[counts == 0] = np.nan
+
+        features[f'avg_{col}'] = means
+        features[f'std_{col}'] = stds
+        features[f'max_{col}'] = maxima
+
+    return features
+
+
+def build_customer_features(df, trends_monthly=None, reference_date=None,
+                            freq_threshold=3, monetary_percentile=0.25,
+                            recency_percentile=0.75, return_monthly=False):
+    """
+    Construye las características por cliente factorizando CustomerID una sola vez
+
+    Sustituye a la combinación de calculate_rfm_metrics, create_customer_features
+    y la agregación mensual de merge_trends_with_customers: RFM, estadísticas de
+    comportamiento, país modal y actividad mensual salen de los mismos códigos
+    enteros sin volver a agrupar las transacciones.
+
+    Args:
+        df (pd.DataFrame): Dataset de transacciones limpio
+        trends_monthly (pd.DataFrame): Tendencias de aggregate_trends_monthly
+            (opcional; añade las columnas avg_/std_/max_trends_*)
+        reference_date (pd.Timestamp): Fecha de referencia para Recency
+            (default: día siguiente a la última transacción)
+        freq_threshold (int): Umbral mínimo de frecuencia para IsLoyal
+        monetary_percentile (float): Percentil mínimo de valor monetario para IsLoyal
+        recency_percentile (float): Percentil máximo de recencia para IsLoyal
+        return_monthly (bool): Devolver también la actividad cliente-mes
+
+    Returns:
+        pd.DataFrame: Características con el esquema de customer_features.csv
+        (y la actividad mensual si return_monthly=True)
+    """
+    customer_codes, customers = factorize_keys(df['CustomerID'], sort=True)
+    valid = customer_codes >= 0
+    data = df if valid.all() else df[valid]
+    codes = customer_codes[valid]
+    n_customers = len(customers)
+
+    dates = datetime_to_ns(data['InvoiceDate'])
+    quantity = data['Quantity'].to_numpy()
+    unit_price = data['UnitPrice'].to_numpy(dtype=np.float64)
+    revenue = data['Revenue'].to_numpy(dtype=np.float64)
+    invoice_codes, _ = factorize_keys(data['InvoiceNo'])
+    product_codes, _ = factorize_keys(data['StockCode'])
+    country_codes, countries = factorize_keys(data['Country'], sort=True)
+
+    counts = np.bincount(codes, minlength=n_customers).astype(np.float64)
+
+    # RFM
+    first_purchase = group_min(codes, dates, n_customers)
+    last_purchase = group_max(codes, dates, n_customers)
+    if reference_date is None:
+        reference_ns = dates.max() + NS_PER_DAY if len(dates) else 0
+    else:
+        reference_ns = np.datetime64(pd.Timestamp(reference_date), 'ns').astype(np.int64)
+
+    # Estadísticas de comportamiento
+    total_quantity, avg_quantity, std_quantity = _group_mean_std(
+        codes, quantity.astype(np.float64), counts)
+    _, avg_unit_price, std_unit_price = _group_mean_std(codes, unit_price, counts)
+    monetary, avg_revenue, std_revenue = _group_mean_std(codes, revenue, counts)
+
+    if np.issubdtype(quantity.dtype, np.integer):
+        total_quantity = total_quantity.round().astype(np.int64)
+
+    features = pd.DataFrame({
+        'CustomerID': customers,
+        'Recency': (reference_ns - last_purchase) // NS_PER_DAY,
+        'Frequency': group_nunique(codes, invoice_codes, n_customers),
+        'Monetary': monetary,
+        'TotalQuantity': total_quantity,
+        'AvgQuantity': avg_quantity,
+        'StdQuantity': std_quantity,
+        'AvgUnitPrice': avg_unit_price,
+        'StdUnitPrice': std_unit_price,
+        'AvgRevenue': avg_revenue,
+        'StdRevenue': std_revenue,
+        'UniqueProducts': group_nunique(codes, product_codes, n_customers),
+        'CustomerLifespan': (last_purchase - first_purchase) // NS_PER_DAY,
+        'Country': _group_mode(codes, country_codes, countries, n_customers)
+    })
+
+    features['IsLoyal'] = define_loyalty_target(
+        features, freq_threshold, monetary_percentile, recency_percentile
+    )
+
+    # Actividad cliente-mes a partir de los mismos códigos
+    months = _month_codes(dates)
+    min_month = int(months.min()) if len(months) else 0
+    n_months = int(months.max()) - min_month + 1 if len(months) else 1
+    pair_keys = codes * n_months + (months - min_month)
+    pairs, pair_index = np.unique(pair_keys, return_inverse=True)
+    pair_customers = pairs // n_months
+    pair_months = pairs % n_months + min_month
+
+    if trends_monthly is not None and not trends_monthly.empty:
+        trends_features = _customer_trends_features(
+            pair_customers, pair_months, trends_monthly, n_customers)
+        for col, values in trends_features.items():
+            features[col] = values
+            features[col] = features[col].fillna(features[col].mean())
+
+    if not return_monthly:
+        return features
+
+    n_pairs = len(pairs)
+    monthly = pd.DataFrame({
+        'CustomerID': customers[pair_customers],
+        'year_month': _month_labels(pair_months),
+        'Revenue': np.bincount(pair_index, weights=revenue, minlength=n_pairs),
+        'InvoiceNo': group_nunique(pair_index, invoice_codes, n_pairs),
+        'Quantity': np.bincount(pair_index, weights=quantity.astype(np.float64), minlength=n_pairs)
+    })
+    if np.issubdtype(quantity.dtype, np.integer):
+        monthly['Quantity'] = monthly['Quantity'].round().astype(np.int64)
+
+    return features, monthly
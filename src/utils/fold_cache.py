@@ -0,0 +1,170 @@
+"""
+Particiones de validación cruzada preparadas una vez y compartidas como arrays memory-mapped
+"""
+
+import hashlib
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+
+DEFAULT_FOLD_CACHE_DIR = 'data/processed/cache/folds'
+
+_SPLIT_ARRAYS = ('X_train', 'y_train', 'X_val', 'y_val')
+
+
+def data_fingerprint(X, y):
+    """Huella de los datos para no reutilizar resultados de otro conjunto"""
+    digest = hashlib.sha256()
+    for array in (np.ascontiguousarray(X), np.ascontiguousarray(y)):
+        digest.update(str((array.shape, array.dtype.str)).encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:16]
+
+
+class FoldCache:
+    """
+    Particiones preparadas en disco
+
+    Cada partición (fold_0 ... fold_{n-1} y holdout) tiene X_train, y_train,
+    X_val e y_val ya escalados, con ruido y seleccionados; se abren con
+    np.load(mmap_mode='r'), así que cualquier número de procesos las lee sin
+    copiarlas.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'manifest.json', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+    @property
+    def key(self):
+        return self.path.name
+
+    @property
+    def n_folds(self):
+        return self.manifest['cv_folds']
+
+    def _load(self, split):
+        return tuple(np.load(self.path / f'{split}_{name}.npy', mmap_mode='r') for name in _SPLIT_ARRAYS)
+
+    def fold(self, index):
+        """
+        Matrices de una partición de validación cruzada
+
+        Returns:
+            tuple: (X_train, y_train, X_val, y_val) como memmaps de solo lectura
+        """
+        if not 0 <= index < self.n_folds:
+            raise IndexError(f"Partición fuera de rango: {index}")
+        return self._load(f'fold_{index}')
+
+    def holdout(self):
+        """Entrenamiento completo y conjunto de test (train_test_split con TEST_SIZE)"""
+        return self._load('holdout')
+
+    def __iter__(self):
+        return (self.fold(index) for index in range(self.n_folds))
+
+
+def _prepare_split(X_train, y_train, X_val, y_val, noise_std, k_features, rng):
+    """Escalado, ruido gaussiano y selección ajustados solo con la parte de entrenamiento"""
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train)
+    X_val = scaler.transform(X_val)
+
+    if noise_std > 0:
+        X_train += rng.normal(0, noise_std, X_train.shape)
+        X_val += rng.normal(0, noise_std, X_val.shape)
+
+    if k_features is not None and k_features < X_train.shape[1]:
+        selector = SelectKBest(f_classif, k=k_features).fit(X_train, y_train)
+        X_train = selector.transform(X_train)
+        X_val = selector.transform(X_val)
+
+    return X_train, y_train, X_val, y_val
+
+
+def prepare_cv_folds(X, y, cache_dir=DEFAULT_FOLD_CACHE_DIR, cv_folds=5, random_state=42,
+                     test_size=0.2, noise_std=0.2, k_features=None, refresh=False):
+    """
+    Materializa en disco las particiones de validación cruzada (una sola vez)
+
+    Reproduce la preparación de los notebooks: train_test_split estratificado,
+    StratifiedKFold sobre la parte de entrenamiento y, en cada partición,
+    StandardScaler, ruido gaussiano y SelectKBest ajustados con su parte de
+    entrenamiento. La caché se identifica por la huella de los datos y los
+    parámetros (RANDOM_STATE, CV_FOLDS, ...), así que una segunda llamada con
+    lo mismo reutiliza los archivos.
+
+    Args:
+        X (np.ndarray): Matriz de características
+        y (np.ndarray): Variable objetivo
+        cache_dir (str): Directorio raíz de la caché
+        cv_folds (int): Particiones (config.CV_FOLDS)
+        random_state (int): Semilla (config.RANDOM_STATE)
+        test_size (float): Proporción de test del holdout (config.TEST_SIZE)
+        noise_std (float): Desviación del ruido añadido tras escalar (0 = sin ruido)
+        k_features (int): Características a conservar con SelectKBest (None = todas)
+        refresh (bool): Regenerar aunque exista
+
+    Returns:
+        FoldCache: Particiones listas para leer con memory-mapping
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    params = {
+        'data': data_fingerprint(X, y),
+        'cv_folds': cv_folds,
+        'random_state': random_state,
+        'test_size': test_size,
+        'noise_std': noise_std,
+        'k_features': k_features
+    }
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    cache_path = Path(cache_dir) / key
+
+    if (cache_path / 'manifest.json').exists() and not refresh:
+        return FoldCache(cache_path)
+
+    # Se escribe en un directorio temporal propio y se renombra al terminar,
+    # así que varios procesos pueden construir la misma caché a la vez
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(prefix=f'{key}.', suffix='.tmp', dir=cache_path.parent))
+
+    rng = np.random.default_rng(random_state)
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=test_size,
+                                           stratify=y, random_state=random_state)
+    splits = {'holdout': (train_idx, test_idx)}
+    cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=random_state)
+    for index, (fold_train, fold_val) in enumerate(cv.split(X[train_idx], y[train_idx])):
+        splits[f'fold_{index}'] = (train_idx[fold_train], train_idx[fold_val])
+
+    for split, (split_train, split_val) in splits.items():
+        arrays = _prepare_split(X[split_train], y[split_train], X[split_val], y[split_val],
+                                noise_std, k_features, rng)
+        for name, array in zip(_SPLIT_ARRAYS, arrays):
+            np.save(tmp_path / f'{split}_{name}.npy', np.ascontiguousarray(array))
+
+    with open(tmp_path / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump({**params, 'n_samples': len(y), 'n_features': X.shape[1]}, f, indent=2)
+
+    if refresh and cache_path.exists():
+        # Apartar la versión anterior con un rename para que nadie lea una caché a medias
+        stale_path = Path(tempfile.mkdtemp(prefix=f'{key}.', suffix='.old', dir=cache_path.parent))
+        cache_path.rename(stale_path / key)
+        shutil.rmtree(stale_path, ignore_errors=True)
+    try:
+        tmp_path.rename(cache_path)
+    except OSError:
+        # Otro proceso terminó antes la misma caché: se usa la suya
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not (cache_path / 'manifest.json').exists():
+            raise
+    return FoldCache(cache_path)
@@ -0,0 +1,273 @@
+"""
+Búsqueda de hiperparámetros en paralelo con successive halving y puntos de control
+"""
+
+import hashlib
+import json
+import math
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid, train_test_split
+from sklearn.neural_network import MLPClassifier
+from sklearn.svm import SVC
+
+from utils.fold_cache import FoldCache, prepare_cv_folds
+
+
+# Nombre en MODELS_CONFIG / PARAM_GRIDS -> clase de sklearn
+ESTIMATORS = {
+    'logistic_regression': LogisticRegression,
+    'random_forest': RandomForestClassifier,
+    'gradient_boosting': GradientBoostingClassifier,
+    'svm': SVC,
+    'mlp_classifier': MLPClassifier
+}
+
+# Datos compartidos por cada proceso del pool (se envían una vez al arrancarlo)
+_WORKER_DATA = {}
+
+
+def _init_worker(fold_cache_path):
+    # Avisos de convergencia y deprecación de cada ajuste, como en los notebooks
+    warnings.filterwarnings('ignore')
+    # Particiones memory-mapped: todos los procesos leen los mismos archivos
+    _WORKER_DATA['folds'] = list(FoldCache(fold_cache_path))
+
+
+def trial_key(model_name, estimator_params, n_samples, fingerprint, scoring, random_state):
+    """
+    Identificador estable de un ensayo
+
+    Incluye todo lo que cambia su resultado: modelo, parámetros completos del
+    estimador (base de MODELS_CONFIG más los de la rejilla), recursos, datos,
+    métrica y semilla. Así un mismo punto de control puede compartirse entre
+    ejecuciones con distinta configuración sin reutilizar ensayos ajenos.
+    """
+    payload = json.dumps([model_name, estimator_params, n_samples, fingerprint, scoring, random_state],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Ensayos terminados de un punto de control JSONL
+
+    Returns:
+        dict: trial_key -> registro del ensayo
+    """
+    trials = {}
+    checkpoint_path = Path(checkpoint_path)
+    if not checkpoint_path.exists():
+        return trials
+    with open(checkpoint_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Línea a medio escribir si el proceso se interrumpió
+                continue
+            trials[record['key']] = record
+    return trials
+
+
+def _evaluate_candidate_on_folds(model_name, estimator_params, train_fraction, scoring, random_state):
+    """Validación cruzada de un candidato sobre las particiones de la FoldCache"""
+    scorer = get_scorer(scoring)
+    scores = []
+    start = time.perf_counter()
+    try:
+        for X_train, y_train, X_val, y_val in _WORKER_DATA['folds']:
+            if train_fraction < 1:
+                subsample, _ = train_test_split(np.arange(len(y_train)), train_size=train_fraction,
+                                                stratify=y_train, random_state=random_state)
+                X_train, y_train = X_train[np.sort(subsample)], y_train[np.sort(subsample)]
+            estimator = ESTIMATORS[model_name](**estimator_params).fit(X_train, y_train)
+            scores.append(scorer(estimator, X_val, y_val))
+        return float(np.mean(scores)), float(np.std(scores)), None, time.perf_counter() - start
+    except Exception as e:
+        return float('nan'), float('nan'), f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+def _halving_schedule(n_candidates, n_samples, factor, min_resources):
+    """Muestras por ronda, como HalvingGridSearchCV (la última usa todos los datos)"""
+    n_rounds = 1 + int(math.floor(math.log(n_candidates, factor))) if n_candidates > 1 else 1
+    while n_rounds > 1 and n_samples / factor ** (n_rounds - 1) < min_resources:
+        n_rounds -= 1
+    return [int(n_samples / factor ** (n_rounds - 1 - r)) for r in range(n_rounds)]
+
+
+def successive_halving_search(X, y, models_config, param_grids, model_names=None, cv_folds=None,
+                              scoring='roc_auc', factor=3, min_resources=None, n_workers=None,
+                              checkpoint_path=None, random_state=42, test_size=0.2, noise_std=0.2,
+                              k_features=None, verbose=True, fold_cache=None):
+    """
+    Búsqueda por successive halving sobre los grids de config.PARAM_GRIDS
+
+    Cada modelo empieza con todas las combinaciones de su grid evaluadas con
+    validación cruzada sobre una fracción estratificada del entrenamiento de
+    cada partición; en cada ronda sobrevive 1/factor de los candidatos y la
+    fracción crece factor veces, hasta usar todos los datos. Los candidatos
+    de una ronda (de todos los modelos) se evalúan en un pool de procesos y
+    cada ensayo terminado se añade al punto de control JSONL, así que una
+    búsqueda interrumpida se reanuda sin volver a entrenar lo ya evaluado.
+
+    Las particiones siempre se preparan como en los notebooks con
+    prepare_cv_folds: solo la parte de entrenamiento de train_test_split
+    (el test queda fuera de la búsqueda) y, en cada partición, escalado,
+    ruido y SelectKBest ajustados con su entrenamiento. Sin fold_cache se
+    preparan en un directorio temporal que se borra al terminar; con
+    fold_cache se reutilizan las ya guardadas en disco.
+
+    Args:
+        X (np.ndarray): Matriz de características (None si se usa fold_cache)
+        y (np.ndarray): Variable objetivo (None si se usa fold_cache)
+        models_config (dict): Parámetros base por modelo (config.MODELS_CONFIG)
+        param_grids (dict): Grids por modelo (config.PARAM_GRIDS)
+        model_names (list): Modelos a buscar (default: los de param_grids soportados)
+        cv_folds (int): Particiones de validación cruzada (config.CV_FOLDS; default:
+            las de fold_cache o 5). Con fold_cache debe coincidir con las suyas
+        scoring (str): Métrica de sklearn a maximizar
+        factor (int): Proporción de candidatos eliminados por ronda
+        min_resources (int): Mínimo de muestras en la primera ronda
+        n_workers (int): Procesos del pool (default: todos los núcleos)
+        checkpoint_path (str): Archivo JSONL de ensayos terminados (None = sin guardar)
+        random_state (int): Semilla de submuestras y particiones (config.RANDOM_STATE)
+        test_size (float): Proporción reservada como test (config.TEST_SIZE)
+        noise_std (float): Ruido gaussiano añadido tras escalar (0 = sin ruido)
+        k_features (int): Características a conservar con SelectKBest (None = todas)
+        verbose (bool): Mostrar el progreso
+        fold_cache (FoldCache): Particiones de prepare_cv_folds (ignora X, y,
+            test_size, noise_std y k_features)
+
+    Returns:
+        dict: 'trials' (DataFrame con todos los ensayos) y 'best' (mejores
+            parámetros y puntuación por modelo)
+    """
+    if fold_cache is None:
+        cv_folds = cv_folds or 5
+        with tempfile.TemporaryDirectory(prefix='folds_') as tmp_dir:
+            fold_cache = prepare_cv_folds(X, y, tmp_dir, cv_folds=cv_folds, random_state=random_state,
+                                          test_size=test_size, noise_std=noise_std,
+                                          k_features=k_features)
+            return successive_halving_search(
+                None, None, models_config, param_grids, model_names=model_names, cv_folds=cv_folds,
+                scoring=scoring, factor=factor, min_resources=min_resources, n_workers=n_workers,
+                checkpoint_path=checkpoint_path, random_state=random_state, verbose=verbose,
+                fold_cache=fold_cache
+            )
+
+    if cv_folds is not None and cv_folds != fold_cache.n_folds:
+        raise ValueError(f"cv_folds={cv_folds} no coincide con las {fold_cache.n_folds} "
+                         f"particiones de la caché {fold_cache.path}")
+    cv_folds = fold_cache.n_folds
+
+    fold_y = fold_cache.fold(0)[1]
+    n_samples = len(fold_y)
+    n_classes = len(np.unique(fold_y))
+    # La clave de la caché identifica datos y preparación, así que el punto de
+    # control es válido tanto con caché persistente como temporal
+    fingerprint = fold_cache.key
+    min_resources = min_resources or cv_folds * n_classes * 10
+
+    if model_names is None:
+        model_names = list(param_grids)
+    unsupported = [name for name in model_names if name not in ESTIMATORS]
+    for name in unsupported:
+        print(f"Modelo sin estimador de sklearn, se omite: {name}")
+    model_names = [name for name in model_names if name in ESTIMATORS]
+
+    candidates = {name: list(ParameterGrid(param_grids[name])) for name in model_names}
+    schedules = {name: _halving_schedule(len(candidates[name]), n_samples, factor, min_resources)
+                 for name in model_names}
+
+    finished = load_checkpoint(checkpoint_path) if checkpoint_path else {}
+    if finished and verbose:
+        print(f"Punto de control con {len(finished)} ensayos terminados")
+    checkpoint = None
+    if checkpoint_path:
+        Path(checkpoint_path).parent.mkdir(parents=True, exist_ok=True)
+        checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+
+    records = []
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(fold_cache.path,)) as executor:
+            for round_index in range(max(len(s) for s in schedules.values())):
+                pending = {}
+                round_records = {name: [] for name in model_names}
+
+                for name in model_names:
+                    schedule = schedules[name]
+                    if round_index >= len(schedule):
+                        continue
+                    size = schedule[round_index]
+                    for params in candidates[name]:
+                        estimator_params = {**models_config.get(name, {}), **params}
+                        key = trial_key(name, estimator_params, size, fingerprint, scoring, random_state)
+                        if key in finished:
+                            round_records[name].append((params, finished[key]))
+                            continue
+                        future = executor.submit(_evaluate_candidate_on_folds, name,
+                                                 estimator_params, size / n_samples, scoring,
+                                                 random_state)
+                        pending[future] = (name, params, size, key)
+
+                for future in as_completed(pending):
+                    name, params, size, key = pending[future]
+                    mean_score, std_score, error, seconds = future.result()
+                    record = {
+                        'key': key, 'model': name, 'params': params, 'round': round_index,
+                        'n_samples': size, 'scoring': scoring, 'mean_score': mean_score, 'std_score': std_score,
+                        'fit_seconds': seconds, 'error': error
+                    }
+                    if checkpoint is not None:
+                        checkpoint.write(json.dumps(record, default=str) + '\n')
+                        checkpoint.flush()
+                    round_records[name].append((params, record))
+
+                # Poda: sobreviven los mejores 1/factor de cada modelo
+                for name, evaluated in round_records.items():
+                    if not evaluated:
+                        continue
+                    for params, record in evaluated:
+                        records.append({**record, 'params': params, 'round': round_index})
+                    ranked = sorted(evaluated, key=lambda item: -np.nan_to_num(item[1]['mean_score'],
+                                                                               nan=-np.inf))
+                    keep = max(1, math.ceil(len(ranked) / factor))
+                    if round_index < len(schedules[name]) - 1:
+                        candidates[name] = [params for params, _ in ranked[:keep]]
+                    else:
+                        candidates[name] = [ranked[0][0]]
+
+                    if verbose:
+                        best_score = ranked[0][1]['mean_score']
+                        print(f"[{name}] ronda {round_index + 1}/{len(schedules[name])}: "
+                              f"{len(evaluated)} candidatos con {schedules[name][round_index]:,} "
+                              f"muestras, mejor {scoring} = {best_score:.4f}")
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    trials = pd.DataFrame(records)
+    best = {}
+    for name in model_names:
+        final = trials[(trials['model'] == name) & (trials['round'] == len(schedules[name]) - 1)]
+        if final.empty or final['mean_score'].isna().all():
+            continue
+        winner = final.loc[final['mean_score'].idxmax()]
+        best[name] = {
+            'params': {**models_config.get(name, {}), **winner['params']},
+            'score': float(winner['mean_score']),
+            'std': float(winner['std_score'])
+        }
+
+    return {'trials': trials, 'best': best}
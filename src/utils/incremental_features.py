@@ -0,0 +1,547 @@
+"""
+Estado agregado por cliente para actualizar RFM y características de forma incremental
+"""
+
+import os
+import pickle
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import define_loyalty_target
+from utils.feature_engine import CUSTOMER_FEATURES_COLUMNS
+from utils.rfm_engine import NS_PER_DAY, datetime_to_ns
+
+
+# Columnas de la matriz de acumuladores
+_STAT_COLUMNS = ['Quantity', 'UnitPrice', 'Revenue']
+# Desplazamientos dentro de cada fila de acumuladores: número de líneas y,
+# por columna, suma, media y M2 (suma de cuadrados de desviaciones, Welford)
+_N, _SUM, _MEAN, _M2 = 0, 1, 4, 7
+_N_STATS = 10
+
+
+class _PersistentState:
+    """Persistencia en disco (pickle con escritura atómica) de los estados incrementales"""
+
+    def save(self, path):
+        """Guardar el estado en disco"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        """Cargar un estado guardado con save()"""
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+class CustomerAggregateState(_PersistentState):
+    """
+    Acumuladores por cliente que absorben lotes de transacciones nuevas
+
+    Por cada cliente se guarda el número de líneas y, de Quantity, UnitPrice
+    y Revenue, la suma, la media y M2 (combinados por lotes con la fórmula de
+    Chan/Welford, estable aunque los importes sean grandes), primera y última
+    compra, los conjuntos de facturas y productos distintos y el recuento de
+    países. Actualizar con un lote solo toca las filas de los clientes
+    presentes en el lote.
+    """
+
+    def __init__(self, initial_capacity=1024):
+        self._index = {}
+        self._customer_ids = []
+        self._stats = np.zeros((initial_capacity, _N_STATS), dtype=np.float64)
+        self._first = np.zeros(initial_capacity, dtype=np.int64)
+        self._last = np.zeros(initial_capacity, dtype=np.int64)
+        self._invoices = []
+        self._products = []
+        self._countries = []
+        self._modal_country = []
+        self.max_date_ns = None
+        # Generación del diario que sigue a este snapshot (ver update_customer_state)
+        self.journal_generation = 0
+
+    def __len__(self):
+        return len(self._customer_ids)
+
+    def _grow(self, required):
+        """Ampliar los arrays duplicando capacidad"""
+        capacity = len(self._first)
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+
+        stats = np.zeros((capacity, self._stats.shape[1]), dtype=np.float64)
+        stats[:len(self)] = self._stats[:len(self)]
+        first = np.zeros(capacity, dtype=np.int64)
+        first[:len(self)] = self._first[:len(self)]
+        last = np.zeros(capacity, dtype=np.int64)
+        last[:len(self)] = self._last[:len(self)]
+        self._stats, self._first, self._last = stats, first, last
+
+    def _rows_for(self, customer_ids):
+        """Filas de los clientes, registrando los que son nuevos"""
+        rows = np.empty(len(customer_ids), dtype=np.int64)
+        new_ids = []
+        for i, customer_id in enumerate(customer_ids):
+            row = self._index.get(customer_id)
+            if row is None:
+                row = len(self._customer_ids) + len(new_ids)
+                self._index[customer_id] = row
+                new_ids.append(customer_id)
+            rows[i] = row
+
+        if new_ids:
+            start = len(self._customer_ids)
+            self._grow(start + len(new_ids))
+            self._customer_ids.extend(new_ids)
+            self._first[start:start + len(new_ids)] = np.iinfo(np.int64).max
+            self._last[start:start + len(new_ids)] = np.iinfo(np.int64).min
+            for _ in new_ids:
+                self._invoices.append(set())
+                self._products.append(set())
+                self._countries.append(Counter())
+                self._modal_country.append('Unknown')
+
+        return rows
+
+    def update(self, transactions):
+        """
+        Absorbe un lote de transacciones limpias
+
+        Args:
+            transactions (pd.DataFrame): Lote limpio con columna Revenue
+
+        Returns:
+            np.ndarray: CustomerID de los clientes actualizados
+        """
+        batch = transactions.dropna(subset=['CustomerID'])
+        if batch.empty:
+            return np.array([])
+
+        batch = batch.assign(InvoiceDate=datetime_to_ns(batch['InvoiceDate']))
+        grouped = batch.groupby('CustomerID', sort=False)
+
+        agg = grouped.agg(
+            n=('Revenue', 'size'),
+            first=('InvoiceDate', 'min'),
+            last=('InvoiceDate', 'max'),
+            **{f'sum_{col}': (col, 'sum') for col in _STAT_COLUMNS}
+        )
+        values = batch[_STAT_COLUMNS].astype(np.float64)
+        batch_means = values.groupby(batch['CustomerID'], sort=False).mean().loc[agg.index]
+        deviations = values - batch_means.loc[batch['CustomerID']].to_numpy()
+        batch_m2 = (deviations ** 2).groupby(batch['CustomerID'], sort=False).sum().loc[agg.index]
+
+        rows = self._rows_for(agg.index.tolist())
+
+        # Combinación de (n, media, M2) del estado y del lote (Chan et al.)
+        n_old = self._stats[rows, _N][:, None]
+        n_batch = agg['n'].to_numpy(dtype=np.float64)[:, None]
+        n_total = n_old + n_batch
+        mean_old = self._stats[rows, _MEAN:_MEAN + 3]
+        delta = batch_means.to_numpy() - mean_old
+        self._stats[rows, _MEAN:_MEAN + 3] = mean_old + delta * (n_batch / n_total)
+        self._stats[rows, _M2:_M2 + 3] += batch_m2.to_numpy() + delta ** 2 * (n_old * n_batch / n_total)
+        self._stats[rows, _N] = n_total[:, 0]
+        self._stats[rows, _SUM:_SUM + 3] += agg[[f'sum_{col}' for col in _STAT_COLUMNS]].to_numpy(dtype=np.float64)
+        self._first[rows] = np.minimum(self._first[rows], agg['first'].to_numpy())
+        self._last[rows] = np.maximum(self._last[rows], agg['last'].to_numpy())
+
+        batch_max = int(agg['last'].max())
+        self.max_date_ns = batch_max if self.max_date_ns is None else max(self.max_date_ns, batch_max)
+
+        # Conjuntos de facturas y productos distintos
+        for customer_id, invoice in batch[['CustomerID', 'InvoiceNo']].drop_duplicates().itertuples(index=False):
+            self._invoices[self._index[customer_id]].add(invoice)
+        for customer_id, product in batch[['CustomerID', 'StockCode']].drop_duplicates().itertuples(index=False):
+            self._products[self._index[customer_id]].add(product)
+
+        # Recuento de países y moda solo para los clientes del lote
+        country_counts = batch.groupby(['CustomerID', 'Country'], sort=False).size()
+        for (customer_id, country), count in country_counts.items():
+            self._countries[self._index[customer_id]][country] += int(count)
+        for customer_id, row in zip(agg.index, rows):
+            counter = self._countries[row]
+            if counter:
+                self._modal_country[row] = min(counter.items(), key=lambda kv: (-kv[1], kv[0]))[0]
+
+        return agg.index.to_numpy()
+
+    def recency(self, reference_date=None):
+        """
+        Recalcula Recency para una fecha de referencia sin tocar los acumuladores
+
+        Args:
+            reference_date (pd.Timestamp): Fecha de referencia
+                (default: día siguiente a la última transacción absorbida)
+
+        Returns:
+            pd.Series: Recency por CustomerID
+        """
+        n = len(self)
+        if reference_date is None:
+            reference_ns = (self.max_date_ns or 0) + NS_PER_DAY
+        else:
+            reference_ns = np.datetime64(pd.Timestamp(reference_date), 'ns').astype(np.int64)
+
+        return pd.Series((reference_ns - self._last[:n]) // NS_PER_DAY,
+                         index=pd.Index(self._customer_ids, name='CustomerID'), name='Recency')
+
+    def to_features(self, reference_date=None, freq_threshold=3, monetary_percentile=0.25,
+                    recency_percentile=0.75):
+        """
+        Deriva la tabla de características con el esquema de customer_features.csv
+
+        Args:
+            reference_date (pd.Timestamp): Fecha de referencia para Recency
+            freq_threshold (int): Umbral mínimo de frecuencia para IsLoyal
+            monetary_percentile (float): Percentil mínimo de valor monetario para IsLoyal
+            recency_percentile (float): Percentil máximo de recencia para IsLoyal
+
+        Returns:
+            pd.DataFrame: Características por cliente ordenadas por CustomerID
+        """
+        n = len(self)
+        stats = self._stats[:n]
+        counts = stats[:, _N]
+
+        means = stats[:, _MEAN:_MEAN + 3].copy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stds = np.sqrt(stats[:, _M2:_M2 + 3] / (counts[:, None] - 1))
+        stds[counts < 2] = np.nan
+
+        features = pd.DataFrame({
+            'CustomerID': self._customer_ids,
+            'Recency': self.recency(reference_date).to_numpy(),
+            'Frequency': [len(invoices) for invoices in self._invoices],
+            'Monetary': stats[:, _SUM + 2],
+            'TotalQuantity': stats[:, _SUM].round().astype(np.int64),
+            'AvgQuantity': means[:, 0],
+            'StdQuantity': stds[:, 0],
+            'AvgUnitPrice': means[:, 1],
+            'StdUnitPrice': stds[:, 1],
+            'AvgRevenue': means[:, 2],
+            'StdRevenue': stds[:, 2],
+            'UniqueProducts': [len(products) for products in self._products],
+            'CustomerLifespan': (self._last[:n] - self._first[:n]) // NS_PER_DAY,
+            'Country': self._modal_country
+        })
+
+        features['IsLoyal'] = define_loyalty_target(
+            features, freq_threshold, monetary_percentile, recency_percentile
+        )
+
+        return features.sort_values('CustomerID', ignore_index=True)[CUSTOMER_FEATURES_COLUMNS]
+
+
+# Columnas de cada lote que se guardan en el diario
+_JOURNAL_COLUMNS = ['CustomerID', 'InvoiceNo', 'StockCode', 'InvoiceDate', 'Country'] + _STAT_COLUMNS
+
+# Estados residentes por ruta: (firma de snapshot y diario, estado, lotes en el diario)
+_RESIDENT_STATES = {}
+
+
+def _journal_path(state_path):
+    return state_path.with_suffix(state_path.suffix + '.journal')
+
+
+def _files_signature(state_path):
+    """Firma (mtime, tamaño) del snapshot y del diario"""
+    signature = []
+    for path in (state_path, _journal_path(state_path)):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _load_customer_state(state_path):
+    """Snapshot más los lotes del diario; devuelve (estado, lotes reaplicados)"""
+    if state_path.exists():
+        state = CustomerAggregateState.load(state_path)
+        if state._stats.shape[1] != _N_STATS:
+            raise ValueError(f"Estado con un formato anterior en {state_path}; hay que reconstruirlo")
+    else:
+        state = CustomerAggregateState()
+
+    n_batches = 0
+    stale = False
+    generation = getattr(state, 'journal_generation', 0)
+    journal_path = _journal_path(state_path)
+    if journal_path.exists():
+        with open(journal_path, 'r+b') as f:
+            while True:
+                offset = f.tell()
+                try:
+                    batch = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception:
+                    # Último lote a medio escribir: se descarta para poder seguir añadiendo
+                    f.truncate(offset)
+                    break
+                if isinstance(batch, dict):
+                    # Cabecera: un diario de otra generación ya está incluido en el snapshot
+                    # (la compactación se interrumpió antes de borrarlo)
+                    if batch['generation'] != generation:
+                        stale = True
+                        break
+                    continue
+                state.update(batch)
+                n_batches += 1
+        if stale:
+            journal_path.unlink()
+    return state, n_batches
+
+
+def update_customer_state(state_path, transactions, compact_every=30):
+    """
+    Absorbe un lote en el estado persistido con coste proporcional al lote
+
+    El estado se mantiene residente en el proceso y cada lote se añade a un
+    diario (state_path + '.journal') en lugar de volver a escribir todo el
+    estado. Cada compact_every lotes se guarda un snapshot completo y se
+    vacía el diario. Al cargar en otro proceso se lee el snapshot y se
+    reaplican los lotes del diario.
+
+    El diario empieza con la generación del snapshot al que sigue, y cada
+    compactación guarda el snapshot con la generación siguiente antes de
+    borrarlo. Si el proceso muere entre ambos pasos, el diario que queda es
+    de la generación anterior y se descarta al cargar en vez de sumar dos
+    veces sus lotes.
+
+    Args:
+        state_path (str): Ruta del archivo de estado
+        transactions (pd.DataFrame): Lote de transacciones limpias
+        compact_every (int): Lotes en el diario antes de reescribir el snapshot
+
+    Returns:
+        CustomerAggregateState: Estado actualizado
+    """
+    state_path = Path(state_path)
+    key = os.path.abspath(state_path)
+    signature = _files_signature(state_path)
+    resident = _RESIDENT_STATES.get(key)
+    if resident is not None and resident[0] == signature:
+        _, state, n_batches = resident
+    else:
+        state, n_batches = _load_customer_state(state_path)
+
+    batch = transactions.dropna(subset=['CustomerID'])[_JOURNAL_COLUMNS]
+    state.update(batch)
+
+    journal_path = _journal_path(state_path)
+    try:
+        if n_batches + 1 >= compact_every:
+            state.journal_generation = getattr(state, 'journal_generation', 0) + 1
+            state.save(state_path)
+            journal_path.unlink(missing_ok=True)
+            n_batches = 0
+        else:
+            journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(journal_path, 'ab') as f:
+                if f.tell() == 0:
+                    pickle.dump({'generation': getattr(state, 'journal_generation', 0)}, f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+            n_batches += 1
+    except BaseException:
+        # El estado residente ya incluye el lote: se vuelve a leer de disco
+        _RESIDENT_STATES.pop(key, None)
+        raise
+
+    _RESIDENT_STATES[key] = (_files_signature(state_path), state, n_batches)
+    return state
+
+
+class CustomerTrendsState(_PersistentState):
+    """
+    Acumuladores por cliente de las tendencias en sus meses activos
+
+    Para cada columna trends_* se guarda, por cliente, el número de meses
+    activos con dato, la suma, la suma de cuadrados y el máximo. Un mes nuevo
+    de tendencias se aplica a los clientes que ya tenían actividad en él y un
+    lote de transacciones solo a los pares cliente-mes que no se habían visto,
+    así que cada actualización toca únicamente a los clientes activos.
+    """
+
+    def __init__(self, trends_columns, initial_capacity=1024):
+        self.trends_columns = list(trends_columns)
+        self._index = {}
+        self._customer_ids = []
+        self._month_values = {}
+        self._month_rows = {}
+        n_columns = len(self.trends_columns)
+        self._count = np.zeros((initial_capacity, n_columns), dtype=np.float64)
+        self._sum = np.zeros((initial_capacity, n_columns), dtype=np.float64)
+        self._sumsq = np.zeros((initial_capacity, n_columns), dtype=np.float64)
+        self._max = np.full((initial_capacity, n_columns), -np.inf)
+
+    def __len__(self):
+        return len(self._customer_ids)
+
+    def _grow(self, required):
+        """Ampliar los arrays duplicando capacidad"""
+        capacity = len(self._count)
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+
+        for name, fill in (('_count', 0.0), ('_sum', 0.0), ('_sumsq', 0.0), ('_max', -np.inf)):
+            current = getattr(self, name)
+            grown = np.full((capacity, len(self.trends_columns)), fill)
+            grown[:len(current)] = current
+            setattr(self, name, grown)
+
+    def _rows_for(self, customer_ids):
+        """Filas de los clientes, registrando los que son nuevos"""
+        rows = np.empty(len(customer_ids), dtype=np.int64)
+        for i, customer_id in enumerate(customer_ids):
+            row = self._index.get(customer_id)
+            if row is None:
+                row = len(self._customer_ids)
+                self._index[customer_id] = row
+                self._customer_ids.append(customer_id)
+            rows[i] = row
+        self._grow(len(self._customer_ids))
+        return rows
+
+    def _apply(self, rows, values):
+        """Sumar los valores de un mes a los acumuladores de clientes distintos"""
+        observed = ~np.isnan(values)
+        filled = np.where(observed, values, 0.0)
+        self._count[rows] += observed
+        self._sum[rows] += filled
+        self._sumsq[rows] += filled ** 2
+        self._max[rows] = np.fmax(self._max[rows], values)
+
+    def update(self, trends_monthly=None, transactions=None):
+        """
+        Absorbe meses nuevos de tendencias y/o un lote de transacciones
+
+        Args:
+            trends_monthly (pd.DataFrame): Filas nuevas de aggregate_trends_monthly
+                (year_month y columnas trends_*)
+            transactions (pd.DataFrame): Lote de transacciones limpias
+
+        Returns:
+            np.ndarray: CustomerID de los clientes cuyas características cambiaron
+        """
+        updated_rows = []
+
+        if trends_monthly is not None and not trends_monthly.empty:
+            months = (pd.to_datetime(trends_monthly['year_month'].astype(str), format='%Y-%m')
+                      .to_numpy(dtype='datetime64[M]').astype(np.int64))
+            values = trends_monthly[self.trends_columns].to_numpy(dtype=np.float64)
+
+            for month, month_values in zip(months, values):
+                known = self._month_values.get(month)
+                if known is not None:
+                    if not np.array_equal(known, month_values, equal_nan=True):
+                        raise ValueError("Las tendencias de un mes ya absorbido han cambiado; "
+                                         "hay que reconstruir el estado")
+                    continue
+                self._month_values[month] = month_values
+                rows = self._month_rows.get(month)
+                if rows:
+                    rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+                    self._apply(rows, month_values)
+                    updated_rows.append(rows)
+
+        if transactions is not None:
+            batch = transactions.dropna(subset=['CustomerID'])
+            if not batch.empty:
+                months = (batch['InvoiceDate'].to_numpy(dtype='datetime64[ns]')
+                          .astype('datetime64[M]').astype(np.int64))
+                pairs = pd.DataFrame({'CustomerID': batch['CustomerID'].to_numpy(), 'month': months})
+                pairs = pairs.drop_duplicates()
+                pair_rows = self._rows_for(pairs['CustomerID'].tolist())
+
+                for month, rows in pd.Series(pair_rows).groupby(pairs['month'].to_numpy()):
+                    seen = self._month_rows.setdefault(month, set())
+                    new_rows = np.array([row for row in rows.to_numpy() if row not in seen], dtype=np.int64)
+                    if len(new_rows) == 0:
+                        continue
+                    seen.update(new_rows.tolist())
+                    month_values = self._month_values.get(month)
+                    if month_values is not None:
+                        self._apply(new_rows, month_values)
+                        updated_rows.append(new_rows)
+
+        if not updated_rows:
+            return np.array([])
+        rows = np.unique(np.concatenate(updated_rows))
+        return np.asarray(self._customer_ids, dtype=object)[rows]
+
+    def to_features(self, customer_ids=None):
+        """
+        Características avg_/std_/max_ de cada tendencia
+
+        Args:
+            customer_ids (array-like): Limitar a estos clientes (p. ej. los
+                devueltos por update); default: todos
+
+        Returns:
+            pd.DataFrame: Mismas columnas que calculate_customer_trends_features,
+                ordenadas por CustomerID
+        """
+        if customer_ids is None:
+            ids = list(self._customer_ids)
+            rows = np.arange(len(self))
+        else:
+            ids = list(customer_ids)
+            rows = np.array([self._index[customer_id] for customer_id in ids], dtype=np.int64)
+
+        counts = self._count[rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self._sum[rows] / counts
+            variances = (self._sumsq[rows] - self._sum[rows] * means) / (counts - 1)
+            stds = np.sqrt(np.clip(variances, 0, None))
+        stds[counts < 2] = np.nan
+        maxima = np.where(counts > 0, self._max[rows], np.nan)
+
+        features = {'CustomerID': ids}
+        for k, col in enumerate(self.trends_columns):
+            features[f'avg_{col}'] = means[:, k]
+            features[f'std_{col}'] = stds[:, k]
+            features[f'max_{col}'] = maxima[:, k]
+
+        return pd.DataFrame(features).sort_values('CustomerID', ignore_index=True)
+
+
+def update_customer_trends_state(state_path, trends_monthly=None, transactions=None):
+    """
+    Carga (o crea) el estado de tendencias, absorbe un mes nuevo y lo vuelve a guardar
+
+    Args:
+        state_path (str): Ruta del archivo de estado
+        trends_monthly (pd.DataFrame): Meses nuevos de tendencias agregadas
+        transactions (pd.DataFrame): Transacciones nuevas
+
+    Returns:
+        tuple: (estado actualizado, CustomerID de los clientes actualizados)
+    """
+    state_path = Path(state_path)
+    if state_path.exists():
+        state = CustomerTrendsState.load(state_path)
+    else:
+        if trends_monthly is None:
+            raise ValueError("La primera actualización necesita trends_monthly para fijar "
+                             "las columnas de tendencias del estado")
+        trends_columns = [col for col in trends_monthly.columns if col.startswith('trends_')]
+        state = CustomerTrendsState(trends_columns)
+    updated = state.update(trends_monthly, transactions)
+    state.save(state_path)
+    return state, updated
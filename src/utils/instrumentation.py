@@ -0,0 +1,380 @@
+"""
+Instrumentación opcional de tiempos y memoria de las rutas calientes del pipeline
+
+Desactivada por defecto. Se activa con la variable de entorno
+RETAIL_INSTRUMENTATION=1 (RETAIL_INSTRUMENTATION=memory para medir también
+la memoria con tracemalloc) o llamando a enable().
+
+Los spans se guardan en un buffer circular de max_spans entradas, así que un
+proceso de larga duración (p. ej. la demo de Streamlit) no acumula memoria.
+El modo de memoria reinicia el pico global de tracemalloc en cada span: no
+combinarlo con otras mediciones basadas en tracemalloc.get_traced_memory(),
+como benchmarks/run_benchmarks.py (que lo desactiva al arrancar).
+"""
+
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+
+
+_ENV_VAR = 'RETAIL_INSTRUMENTATION'
+DEFAULT_MAX_SPANS = 100_000
+
+
+class _State:
+    enabled = False
+    trace_memory = False
+    owns_tracing = False
+
+
+_STATE = _State()
+_LOCK = threading.Lock()
+_SPANS = deque(maxlen=DEFAULT_MAX_SPANS)
+_IDS = itertools.count(1)
+_LOCAL = threading.local()
+_ORIGIN_NS = time.perf_counter_ns()
+
+
+def enable(trace_memory=False, max_spans=DEFAULT_MAX_SPANS):
+    """
+    Activa el registro de spans
+
+    Args:
+        trace_memory (bool): Medir memoria asignada y pico con tracemalloc
+            (añade un coste apreciable a cada asignación mientras está activo)
+        max_spans (int): Spans conservados; al llenarse se descartan los más antiguos
+    """
+    global _SPANS
+    if max_spans != _SPANS.maxlen:
+        with _LOCK:
+            _SPANS = deque(_SPANS, maxlen=max_spans)
+    _STATE.trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STATE.owns_tracing = True
+    _STATE.enabled = True
+
+
+def disable():
+    """Desactiva el registro (los spans ya guardados se conservan)"""
+    _STATE.enabled = False
+    if _STATE.owns_tracing and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _STATE.owns_tracing = False
+    _STATE.trace_memory = False
+
+
+def is_enabled():
+    return _STATE.enabled
+
+
+def reset():
+    """Descarta los spans registrados"""
+    with _LOCK:
+        _SPANS.clear()
+
+
+def get_spans():
+    """Copia de los spans conservados (lista de dicts, como mucho max_spans)"""
+    with _LOCK:
+        return list(_SPANS)
+
+
+class _NullSpan:
+    """Span que no registra nada (instrumentación desactivada)"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def start(self, name, **attrs):
+        pass
+
+    def end(self):
+        pass
+
+
+_DISABLED = _NullSpan()
+
+
+def _count_rows(value):
+    """Filas de un DataFrame, Series o array; None para el resto"""
+    shape = getattr(value, 'shape', None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+class _Span:
+    """Span activo: tiempo de pared, filas y memoria de una llamada"""
+
+    __slots__ = ('name', 'rows', 'attrs', 'span_id', 'parent_id', 'depth',
+                 'start_ns', 'mem_start', 'peak_seen')
+
+    def __init__(self, name, rows=None, attrs=None):
+        self.name = name
+        self.rows = rows
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = getattr(_LOCAL, 'stack', None)
+        if stack is None:
+            stack = _LOCAL.stack = []
+        parent = stack[-1] if stack else None
+        self.span_id = next(_IDS)
+        self.parent_id = parent.span_id if parent else None
+        self.depth = len(stack)
+        self.mem_start = None
+        if _STATE.trace_memory and tracemalloc.is_tracing():
+            # El pico de tracemalloc es global: se guarda el del padre antes de reiniciarlo
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None and parent.mem_start is not None:
+                parent.peak_seen = max(parent.peak_seen, peak)
+            tracemalloc.reset_peak()
+            self.mem_start = current
+            self.peak_seen = current
+        stack.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        stack = _LOCAL.stack
+        # Los hijos que quedaron abiertos (p. ej. por una excepción) se descartan
+        if self in stack:
+            del stack[stack.index(self):]
+
+        record = {
+            'id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'thread': threading.get_ident(),
+            'depth': self.depth,
+            'start_us': (self.start_ns - _ORIGIN_NS) / 1000,
+            'duration_ms': (end_ns - self.start_ns) / 1e6,
+            'rows': self.rows,
+            'allocated_mb': None,
+            'peak_mb': None,
+            'error': exc_type.__name__ if exc_type else None
+        }
+        if self.mem_start is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.peak_seen)
+            record['allocated_mb'] = (current - self.mem_start) / 2**20
+            record['peak_mb'] = (peak - self.mem_start) / 2**20
+            if stack and stack[-1].mem_start is not None:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+        if self.attrs:
+            record['attrs'] = self.attrs
+
+        with _LOCK:
+            _SPANS.append(record)
+        return False
+
+
+def span(name, rows=None, **attrs):
+    """
+    Context manager que registra un span (no hace nada si está desactivado)
+
+    Args:
+        name (str): Nombre del span
+        rows (int): Filas procesadas
+        **attrs: Atributos adicionales para la exportación
+
+    Returns:
+        Context manager; dentro del bloque se puede fijar s.rows
+    """
+    if not _STATE.enabled:
+        return _DISABLED
+    return _Span(name, rows, attrs or None)
+
+
+class _Stages:
+    """Etapas consecutivas: abrir una cierra la anterior"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._current = None
+
+    def start(self, name, **attrs):
+        self.end()
+        self._current = _Span(f'{self.prefix}.{name}', None, attrs or None).__enter__()
+
+    def end(self):
+        if self._current is not None:
+            self._current.__exit__(None, None, None)
+            self._current = None
+
+
+def stages(prefix):
+    """
+    Marcador de etapas secuenciales sin anidar bloques with
+
+    Útil en scripts largos como demo_app, donde cada sección se mide con
+    start('nombre') y la última se cierra con end().
+
+    Args:
+        prefix (str): Prefijo de los nombres de span ({prefix}.{nombre})
+
+    Returns:
+        Objeto con start(name, **attrs) y end()
+    """
+    if not _STATE.enabled:
+        return _DISABLED
+    return _Stages(prefix)
+
+
+def instrumented(func=None, *, name=None):
+    """
+    Decorador que registra un span por llamada
+
+    Las filas son las del primer argumento con shape (DataFrame, Series o
+    array) o, si no hay, las del resultado. Desactivado, el coste es una
+    comprobación de un atributo por llamada.
+
+    Uso:
+        @instrumented
+        def clean_retail_data(df): ...
+
+        @instrumented(name='trends.merge')
+        def merge_trends_with_customers(...): ...
+    """
+    def decorator(f):
+        span_name = name or f'{f.__module__.rsplit(".", 1)[-1]}.{f.__qualname__}'
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _STATE.enabled:
+                return f(*args, **kwargs)
+            rows = None
+            for arg in itertools.chain(args, kwargs.values()):
+                rows = _count_rows(arg)
+                if rows is not None:
+                    break
+            with _Span(span_name, rows) as active:
+                result = f(*args, **kwargs)
+                if active.rows is None:
+                    active.rows = _count_rows(result)
+                return result
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def summarize(spans=None, top=15):
+    """
+    Tabla de puntos calientes agregada por nombre de span
+
+    El tiempo propio descuenta el de los spans hijos, así que señala dónde
+    se gasta realmente el tiempo aunque las llamadas estén anidadas.
+
+    Args:
+        spans (list): Spans a resumir (default: los registrados)
+        top (int): Filas a devolver (None = todas)
+
+    Returns:
+        pd.DataFrame: calls, total_ms, self_ms, mean_ms, max_ms, rows,
+            rows_per_s y peak_mb por span, ordenado por self_ms
+    """
+    spans = get_spans() if spans is None else spans
+    columns = ['name', 'calls', 'total_ms', 'self_ms', 'mean_ms', 'max_ms', 'rows', 'rows_per_s', 'peak_mb']
+    if not spans:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.DataFrame(spans)
+    df['rows'] = pd.to_numeric(df['rows'])
+    df['peak_mb'] = pd.to_numeric(df['peak_mb'])
+    child_ms = df.groupby('parent_id')['duration_ms'].sum()
+    df['self_ms'] = df['duration_ms'] - df['id'].map(child_ms).fillna(0)
+
+    summary = df.groupby('name').agg(
+        calls=('id', 'size'),
+        total_ms=('duration_ms', 'sum'),
+        self_ms=('self_ms', 'sum'),
+        mean_ms=('duration_ms', 'mean'),
+        max_ms=('duration_ms', 'max'),
+        rows=('rows', lambda rows: rows.sum(min_count=1)),
+        peak_mb=('peak_mb', 'max')
+    ).reset_index()
+    summary['rows_per_s'] = summary['rows'] / (summary['total_ms'] / 1000)
+    summary = summary[columns].sort_values('self_ms', ascending=False).reset_index(drop=True)
+    return summary.head(top) if top else summary
+
+
+def print_summary(spans=None, top=15):
+    """Imprime la tabla de summarize()"""
+    summary = summarize(spans, top)
+    if summary.empty:
+        print("Sin spans registrados")
+        return
+    print(summary.to_string(index=False, float_format=lambda v: f'{v:,.2f}'))
+
+
+def export_jsonl(path, spans=None):
+    """
+    Escribe un span por línea en JSONL
+
+    Returns:
+        int: Spans escritos
+    """
+    spans = get_spans() if spans is None else spans
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in spans:
+            f.write(json.dumps(record, default=str) + '\n')
+    return len(spans)
+
+
+def export_chrome_trace(path, spans=None):
+    """
+    Exporta los spans en formato Chrome Trace (chrome://tracing o Perfetto)
+
+    Returns:
+        int: Spans escritos
+    """
+    spans = get_spans() if spans is None else spans
+    pid = os.getpid()
+    events = []
+    for record in spans:
+        args = {key: record[key] for key in ('rows', 'allocated_mb', 'peak_mb', 'error')
+                if record.get(key) is not None}
+        args.update(record.get('attrs') or {})
+        events.append({
+            'name': record['name'], 'cat': record['name'].split('.', 1)[0], 'ph': 'X',
+            'ts': record['start_us'], 'dur': record['duration_ms'] * 1000,
+            'pid': pid, 'tid': record['thread'], 'args': args
+        })
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+    return len(events)
+
+
+def export(path, spans=None):
+    """Exporta según la extensión: .jsonl o .json (Chrome Trace)"""
+    if Path(path).suffix.lower() == '.jsonl':
+        return export_jsonl(path, spans)
+    return export_chrome_trace(path, spans)
+
+
+_env_value = os.environ.get(_ENV_VAR, '').strip().lower()
+if _env_value and _env_value not in ('0', 'false', 'no', 'off'):
+    enable(trace_memory=(_env_value == 'memory'))
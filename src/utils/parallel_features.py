@@ -0,0 +1,145 @@
+"""
+Cálculo paralelo de características por cliente particionando por CustomerID
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import create_customer_features, define_loyalty_target
+from utils.feature_engine import CUSTOMER_FEATURES_COLUMNS
+from utils.rfm_engine import NS_PER_DAY, calculate_rfm_metrics_fast, datetime_to_ns, factorize_keys
+
+
+# Columnas numéricas que se comparten con los procesos mediante memmap
+_SHARED_COLUMNS = ['CustomerID', 'InvoiceDate', 'Quantity', 'UnitPrice', 'Revenue',
+                   'InvoiceNo', 'StockCode', 'Country']
+
+
+def _write_shards(df, n_shards, work_dir):
+    """
+    Reordena las transacciones por partición y las guarda como arrays .npy
+
+    Las columnas de texto se guardan como códigos enteros. Country se
+    factoriza ordenado para que la moda por códigos desempate igual que
+    la moda sobre los nombres.
+
+    Returns:
+        tuple: (offsets, countries)
+    """
+    customers = df['CustomerID'].to_numpy(dtype=np.float64)
+    shard_ids = pd.util.hash_array(customers) % np.uint64(n_shards)
+    order = np.argsort(shard_ids, kind='stable')
+    offsets = np.searchsorted(shard_ids[order], np.arange(n_shards + 1, dtype=np.uint64))
+
+    country_codes, countries = factorize_keys(df['Country'], sort=True)
+    columns = {
+        'CustomerID': customers,
+        'InvoiceDate': datetime_to_ns(df['InvoiceDate']),
+        'Quantity': df['Quantity'].to_numpy(),
+        'UnitPrice': df['UnitPrice'].to_numpy(dtype=np.float64),
+        'Revenue': df['Revenue'].to_numpy(dtype=np.float64),
+        'InvoiceNo': factorize_keys(df['InvoiceNo'])[0],
+        'StockCode': factorize_keys(df['StockCode'])[0],
+        'Country': country_codes
+    }
+
+    for name, values in columns.items():
+        np.save(Path(work_dir) / f'{name}.npy', values[order])
+
+    return offsets, np.asarray(countries, dtype=object)
+
+
+def _load_shard(work_dir, start, stop):
+    """Vistas de solo lectura sobre las filas de una partición"""
+    columns = {}
+    for name in _SHARED_COLUMNS:
+        values = np.load(Path(work_dir) / f'{name}.npy', mmap_mode='r')[start:stop]
+        if name == 'InvoiceDate':
+            values = values.view('datetime64[ns]')
+        columns[name] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def _compute_shard(work_dir, start, stop, reference_ns, trends_data):
+    """Características de los clientes de una partición (se ejecuta en un proceso hijo)"""
+    shard = _load_shard(work_dir, start, stop)
+    if shard.empty:
+        return None
+
+    rfm = calculate_rfm_metrics_fast(shard, reference_date=pd.Timestamp(reference_ns))
+    features = create_customer_features(shard)
+    result = rfm.merge(features, on='CustomerID')
+
+    if trends_data is not None:
+        from utils.trends_utils import calculate_customer_trends_features
+        trends_features = calculate_customer_trends_features(trends_data, shard)
+        result = result.merge(trends_features, on='CustomerID', how='left')
+
+    return result
+
+
+def compute_customer_features_parallel(transactions, trends_data=None, n_workers=None,
+                                       n_shards=None, work_dir=None, freq_threshold=3,
+                                       monetary_percentile=0.25, recency_percentile=0.75):
+    """
+    Calcula RFM, características de comportamiento y tendencias en paralelo
+
+    Las transacciones se particionan por hash de CustomerID, se escriben una
+    vez como arrays memmap y cada proceso lee su partición sin copiarla. Las
+    partes que dependen de toda la población (fecha de referencia, IsLoyal e
+    imputación de tendencias) se resuelven en el proceso principal, así que
+    el resultado coincide con el cálculo secuencial.
+
+    Args:
+        transactions (pd.DataFrame): Dataset de transacciones limpio
+        trends_data (pd.DataFrame): Tendencias agregadas por mes (opcional)
+        n_workers (int): Número de procesos (default: os.cpu_count())
+        n_shards (int): Número de particiones (default: 4 por proceso)
+        work_dir (str): Directorio para los arrays compartidos (default: temporal)
+        freq_threshold (int): Umbral mínimo de frecuencia para IsLoyal
+        monetary_percentile (float): Percentil mínimo de valor monetario para IsLoyal
+        recency_percentile (float): Percentil máximo de recencia para IsLoyal
+
+    Returns:
+        pd.DataFrame: Características por cliente ordenadas por CustomerID
+    """
+    transactions = transactions.dropna(subset=['CustomerID'])
+    n_workers = n_workers or os.cpu_count() or 1
+    n_shards = n_shards or n_workers * 4
+
+    reference_ns = int(datetime_to_ns(transactions['InvoiceDate']).max()) + NS_PER_DAY
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as shared_dir:
+        offsets, countries = _write_shards(transactions, n_shards, shared_dir)
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(_compute_shard, shared_dir, int(offsets[i]), int(offsets[i + 1]),
+                                reference_ns, trends_data)
+                for i in range(n_shards)
+            ]
+            parts = [future.result() for future in futures]
+
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return pd.DataFrame(columns=CUSTOMER_FEATURES_COLUMNS)
+
+    # Concatenación determinista independiente del orden de finalización
+    result = pd.concat(parts, ignore_index=True).sort_values('CustomerID', ignore_index=True)
+    result['Country'] = countries[result['Country'].to_numpy(dtype=np.int64)]
+
+    result = result.drop(columns=['TotalRevenue', 'FirstPurchase', 'LastPurchase'])
+    result['IsLoyal'] = define_loyalty_target(
+        result, freq_threshold, monetary_percentile, recency_percentile
+    )
+
+    trends_columns = [col for col in result.columns if col not in CUSTOMER_FEATURES_COLUMNS]
+    for col in trends_columns:
+        result[col] = result[col].fillna(result[col].mean())
+
+    return result[CUSTOMER_FEATURES_COLUMNS + trends_columns]
@@ -0,0 +1,184 @@
+"""
+Caché de predicciones para la exploración interactiva (what-if) de la demo
+"""
+
+import copy
+import itertools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from utils.scoring import DEFAULT_FEATURE_VALUES, MODEL_FEATURE_COLUMNS, assemble_feature_matrix, score_batch
+
+
+def canonical_feature_key(features, defaults=DEFAULT_FEATURE_VALUES, decimals=6):
+    """
+    Clave canónica de un vector de características
+
+    Completa las características ausentes con sus valores por defecto y las
+    ordena como MODEL_FEATURE_COLUMNS, de modo que dos diccionarios que
+    producen la misma fila del modelo generan la misma clave.
+
+    Args:
+        features (dict): Características del cliente
+        defaults (dict): Valores por defecto por característica
+        decimals (int): Decimales con los que se redondea cada valor
+
+    Returns:
+        tuple: Valores float en el orden del modelo
+    """
+    return tuple(
+        round(float(features.get(col, defaults[col])), decimals) for col in MODEL_FEATURE_COLUMNS
+    )
+
+
+_FINGERPRINTS = weakref.WeakKeyDictionary()
+_FINGERPRINTS_LOCK = threading.Lock()
+_FINGERPRINT_IDS = itertools.count(1)
+
+
+def model_fingerprint(*objects):
+    """
+    Huella de los artefactos entrenados (modelo, scaler, selector)
+
+    Cada objeto recibe un número propio mientras siga vivo (a diferencia de
+    id(), no se reutiliza cuando el objeto se libera), así que un modelo
+    recargado o reentrenado nunca lee las entradas de otro. No detecta
+    cambios hechos sobre el mismo objeto, como volver a llamar a fit().
+
+    Args:
+        *objects: Objetos entrenados
+
+    Returns:
+        tuple: (clase, número) de cada objeto
+    """
+    fingerprints = []
+    with _FINGERPRINTS_LOCK:
+        for obj in objects:
+            fingerprint = _FINGERPRINTS.get(obj)
+            if fingerprint is None:
+                fingerprint = _FINGERPRINTS[obj] = (type(obj).__name__, next(_FINGERPRINT_IDS))
+            fingerprints.append(fingerprint)
+    return tuple(fingerprints)
+
+
+class PredictionCache:
+    """
+    Caché LRU acotada con caducidad opcional y contadores de aciertos y fallos
+
+    Es segura entre hilos para poder compartirse entre sesiones de Streamlit.
+    """
+
+    def __init__(self, maxsize=4096, ttl_seconds=None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Devuelve el valor en caché o lo calcula y lo guarda
+
+        Args:
+            key: Clave hashable
+            compute (callable): Función sin argumentos que calcula el valor
+
+        Returns:
+            Valor asociado a la clave
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Aciertos, fallos, tamaño y tasa de acierto"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+def cached_prediction(cache, features, model, scaler, selector):
+    """
+    Predicción determinista (sin ruido) de un cliente, memorizada en la caché
+
+    La clave incluye la huella del modelo, el scaler y el selector, así que
+    una misma caché puede compartirse entre modelos.
+
+    Args:
+        cache (PredictionCache): Caché compartida
+        features (dict): Características del cliente
+        model: Clasificador entrenado
+        scaler: Scaler entrenado
+        selector: Selector de características entrenado
+
+    Returns:
+        tuple: (predicción, probabilidad de la clase positiva)
+    """
+    key = ('prediction', model_fingerprint(model, scaler, selector), canonical_feature_key(features))
+
+    def compute():
+        predictions, probabilities = score_batch(assemble_feature_matrix([features]),
+                                                 model, scaler, selector, noise_std=0.0)
+        return predictions[0], float(probabilities[0])
+
+    return cache.get_or_compute(key, compute)
+
+
+def cached_insights(cache, customer_data, insights_fn):
+    """
+    Insights de negocio memorizados por características y probabilidad
+
+    Args:
+        cache (PredictionCache): Caché compartida
+        customer_data (dict): Características del cliente con 'probability'
+        insights_fn (callable): Función que genera los insights (p. ej.
+            generate_customer_insights)
+
+    Returns:
+        dict: Copia de los insights del cliente (se puede modificar sin
+            alterar la caché)
+    """
+    key = ('insights', f'{insights_fn.__module__}.{insights_fn.__qualname__}',
+           canonical_feature_key(customer_data), round(float(customer_data.get('probability', 0.5)), 12))
+    return copy.deepcopy(cache.get_or_compute(key, lambda: insights_fn(customer_data)))
@@ -0,0 +1,198 @@
+"""
+Puntuación vectorizada de fidelización compartida por la demo, los notebooks y los procesos batch
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from utils.tree_compiler import CompiledTreeEnsemble
+
+
+# Orden de características con el que se entrenaron scaler, selector y modelo
+MODEL_FEATURE_COLUMNS = [
+    'Recency', 'Frequency', 'Monetary', 'TotalQuantity', 'AvgQuantity',
+    'AvgUnitPrice', 'AvgRevenue', 'UniqueProducts', 'CustomerLifespan',
+    'avg_trends_online_shopping', 'std_trends_online_shopping', 'max_trends_online_shopping',
+    'avg_trends_retail_therapy', 'std_trends_retail_therapy', 'max_trends_retail_therapy',
+    'avg_trends_gift_shopping', 'std_trends_gift_shopping', 'max_trends_gift_shopping',
+    'Country_encoded'
+]
+
+# Valores por defecto usados por la demo cuando falta una característica
+DEFAULT_FEATURE_VALUES = {
+    'Recency': 30,
+    'Frequency': 5,
+    'Monetary': 500,
+    'TotalQuantity': 10,
+    'AvgQuantity': 2.0,
+    'AvgUnitPrice': 3.5,
+    'AvgRevenue': 100.0,
+    'UniqueProducts': 10,
+    'CustomerLifespan': 90,
+    'avg_trends_online_shopping': 50.0,
+    'std_trends_online_shopping': 10.0,
+    'max_trends_online_shopping': 80.0,
+    'avg_trends_retail_therapy': 45.0,
+    'std_trends_retail_therapy': 8.0,
+    'max_trends_retail_therapy': 75.0,
+    'avg_trends_gift_shopping': 40.0,
+    'std_trends_gift_shopping': 12.0,
+    'max_trends_gift_shopping': 70.0,
+    'Country_encoded': 1
+}
+
+
+def assemble_feature_matrix(records, defaults=DEFAULT_FEATURE_VALUES):
+    """
+    Construye la matriz de características contigua en el orden del modelo
+
+    Args:
+        records (list | pd.DataFrame): Lista de diccionarios o DataFrame de clientes
+        defaults (dict): Valor por defecto para cada característica ausente
+
+    Returns:
+        np.ndarray: Matriz float64 (n_clientes, n_características)
+    """
+    if isinstance(records, pd.DataFrame):
+        frame = records.reindex(columns=MODEL_FEATURE_COLUMNS)
+        frame = frame.fillna({col: defaults[col] for col in MODEL_FEATURE_COLUMNS})
+        return np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+
+    defaults_row = [defaults[col] for col in MODEL_FEATURE_COLUMNS]
+    return np.array(
+        [[record.get(col, default) for col, default in zip(MODEL_FEATURE_COLUMNS, defaults_row)]
+         for record in records],
+        dtype=np.float64
+    ).reshape(-1, len(MODEL_FEATURE_COLUMNS))
+
+
+def scale_features(X, scaler):
+    """
+    Aplica el scaler sobre un array
+
+    Para StandardScaler se aplica directamente (X - mean_) / scale_, que es la
+    misma operación que transform() sin la validación por llamada.
+    """
+    if type(scaler) is StandardScaler:
+        X_scaled = np.array(X, dtype=np.float64, copy=True)
+        if scaler.with_mean:
+            X_scaled -= scaler.mean_
+        if scaler.with_std:
+            X_scaled /= scaler.scale_
+        return X_scaled
+    return scaler.transform(X)
+
+
+def select_features(X, selector):
+    """Aplica el selector como máscara de columnas cuando es posible"""
+    if hasattr(selector, 'get_support'):
+        return X[:, selector.get_support()]
+    return selector.transform(X)
+
+
+# Clasificadores cuyo predict() es exactamente el argmax de predict_proba, así
+# que la etiqueta se obtiene sin una segunda pasada por el modelo. En el resto
+# no se cumple siempre (p. ej. SVC(probability=True), cuyas probabilidades de
+# Platt pueden contradecir a decision_function) y se llama a predict().
+_PROBA_ARGMAX_MODELS = (RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier,
+                        CompiledTreeEnsemble)
+
+
+def score_batch(features_matrix, model, scaler, selector, noise_std=0.0, random_state=None):
+    """
+    Puntúa un lote completo de clientes con una sola pasada por scaler, selector y modelo
+
+    Args:
+        features_matrix (np.ndarray): Matriz (n, n_características) en el orden de
+            MODEL_FEATURE_COLUMNS (ver assemble_feature_matrix)
+        model: Clasificador entrenado con predict_proba
+        scaler: Scaler entrenado
+        selector: Selector de características entrenado
+        noise_std (float): Desviación del ruido gaussiano añadido tras escalar
+            (0 = puntuación determinista)
+        random_state (int | np.random.Generator): Semilla del ruido
+
+    Returns:
+        tuple: (predicciones, probabilidades de la clase positiva)
+    """
+    X_scaled = scale_features(features_matrix, scaler)
+
+    if noise_std > 0:
+        rng = np.random.default_rng(random_state)
+        X_scaled += rng.normal(0, noise_std, X_scaled.shape)
+
+    X_selected = select_features(X_scaled, selector)
+
+    probabilities = model.predict_proba(X_selected)
+    if isinstance(model, _PROBA_ARGMAX_MODELS):
+        predictions = np.asarray(model.classes_).take(np.argmax(probabilities, axis=1))
+    else:
+        predictions = model.predict(X_selected)
+
+    return predictions, probabilities[:, 1]
+
+
+DEFAULT_MC_BLOCK_ROWS = 200_000
+
+
+def score_batch_monte_carlo(features_matrix, model, scaler, selector, n_replicas=200,
+                            noise_std=0.1, confidence=0.95, random_state=None,
+                            max_block_rows=DEFAULT_MC_BLOCK_ROWS):
+    """
+    Puntuación Monte Carlo: K réplicas con ruido por cliente en llamadas por lotes al modelo
+
+    El ruido gaussiano es independiente por característica, así que se añade
+    directamente a las columnas seleccionadas (misma distribución que sumarlo
+    antes del selector). Las réplicas de un bloque de clientes se apilan en
+    una única matriz (clientes * K, k) y se puntúan con una sola llamada a
+    predict_proba; el tamaño del bloque se acota con max_block_rows.
+
+    Args:
+        features_matrix (np.ndarray): Matriz (n, n_características) en el orden de
+            MODEL_FEATURE_COLUMNS
+        model: Clasificador entrenado con predict_proba
+        scaler: Scaler entrenado
+        selector: Selector de características entrenado
+        n_replicas (int): Réplicas con ruido por cliente (K)
+        noise_std (float): Desviación del ruido gaussiano añadido tras escalar
+        confidence (float): Nivel del intervalo de confianza
+        random_state (int | np.random.Generator): Semilla del ruido
+        max_block_rows (int): Máximo de filas (clientes * K) por llamada al modelo
+
+    Returns:
+        tuple: (predicciones, probabilidad media, límite inferior, límite superior)
+            de la clase positiva
+    """
+    if n_replicas < 1:
+        raise ValueError(f"n_replicas debe ser al menos 1: {n_replicas}")
+
+    rng = np.random.default_rng(random_state)
+    X_selected = select_features(scale_features(features_matrix, scaler), selector)
+    n_rows, n_selected = X_selected.shape
+
+    mean = np.empty(n_rows, dtype=np.float64)
+    lower = np.empty(n_rows, dtype=np.float64)
+    upper = np.empty(n_rows, dtype=np.float64)
+    alpha = (1 - confidence) / 2
+    block = max(1, max_block_rows // n_replicas)
+
+    for start in range(0, n_rows, block):
+        X_block = X_selected[start:start + block]
+        replicas = X_block[:, None, :] + rng.normal(0, noise_std, (len(X_block), n_replicas, n_selected))
+        probabilities = model.predict_proba(replicas.reshape(-1, n_selected))[:, 1]
+        probabilities = probabilities.reshape(len(X_block), n_replicas)
+
+        mean[start:start + block] = probabilities.mean(axis=1)
+        lower[start:start + block], upper[start:start + block] = np.quantile(
+            probabilities, [alpha, 1 - alpha], axis=1
+        )
+
+    # Argmax de la probabilidad media, con el mismo desempate que score_batch
+    # (a 0.5 gana la primera clase)
+    classes = np.asarray(model.classes_)
+    predictions = np.where(mean > 0.5, classes[1], classes[0])
+
+    return predictions, mean, lower, upper
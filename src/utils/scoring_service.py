@@ -0,0 +1,259 @@
+"""
+Servicio HTTP asíncrono de puntuación con agrupación de peticiones en micro-lotes
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from http import HTTPStatus
+
+import numpy as np
+
+from utils.scoring import MODEL_FEATURE_COLUMNS, assemble_feature_matrix, score_batch
+
+
+class LatencyTracker:
+    """Ventana de latencias recientes con percentiles"""
+
+    def __init__(self, window=10_000):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self, quantiles=(50, 90, 95, 99)):
+        """Percentiles en milisegundos de la ventana actual"""
+        if not self._samples:
+            return {f'p{q}': None for q in quantiles}
+        values = np.percentile(np.fromiter(self._samples, dtype=np.float64), quantiles) * 1000
+        return {f'p{q}': round(float(v), 3) for q, v in zip(quantiles, values)}
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones concurrentes en lotes para el modelo
+
+    Cada petición deja sus filas en una cola (troceadas en bloques de como
+    mucho max_batch_size); un bucle de fondo las agrupa hasta max_batch_size
+    filas o hasta que pasan max_wait_ms desde la primera, puntúa el lote con
+    score_batch en un hilo aparte y reparte los resultados a cada petición.
+    Un bloque que no cabe en el lote actual abre el siguiente.
+    """
+
+    def __init__(self, model, scaler, selector, max_batch_size=256, max_wait_ms=5.0):
+        self.model = model
+        self.scaler = scaler
+        self.selector = selector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.request_latency = LatencyTracker()
+        self.batch_latency = LatencyTracker()
+        self.batch_sizes = deque(maxlen=10_000)
+        self._queue = None
+        self._worker = None
+        self._carry = None
+
+    def start(self):
+        """Arrancar el bucle de agrupación en el event loop actual"""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def score(self, features_matrix):
+        """
+        Puntúa una o varias filas esperando al micro-lote correspondiente
+
+        Args:
+            features_matrix (np.ndarray): Filas en el orden de MODEL_FEATURE_COLUMNS
+
+        Returns:
+            tuple: (predicciones, probabilidades); vacías si no hay filas
+        """
+        if len(features_matrix) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for offset in range(0, len(features_matrix), self.max_batch_size):
+            future = loop.create_future()
+            await self._queue.put((features_matrix[offset:offset + self.max_batch_size], future))
+            futures.append(future)
+
+        parts = await asyncio.gather(*futures)
+        if len(parts) == 1:
+            result = parts[0]
+        else:
+            result = tuple(np.concatenate(arrays) for arrays in zip(*parts))
+        self.request_latency.record(time.perf_counter() - start)
+        return result
+
+    async def _collect(self):
+        """Esperar la primera petición y acumular hasta llenar el lote o agotar la espera"""
+        if self._carry is not None:
+            pending = [self._carry]
+            self._carry = None
+        else:
+            pending = [await self._queue.get()]
+        n_rows = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+
+        while n_rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if n_rows + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            pending.append(item)
+            n_rows += len(item[0])
+
+        return pending
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            matrices = [matrix for matrix, _ in pending]
+            batch = np.concatenate(matrices) if len(matrices) > 1 else matrices[0]
+
+            start = time.perf_counter()
+            try:
+                predictions, probabilities = await loop.run_in_executor(
+                    None, score_batch, batch, self.model, self.scaler, self.selector
+                )
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batch_latency.record(time.perf_counter() - start)
+            self.batch_sizes.append(len(batch))
+
+            offset = 0
+            for matrix, future in pending:
+                size = len(matrix)
+                if not future.done():
+                    future.set_result((predictions[offset:offset + size],
+                                       probabilities[offset:offset + size]))
+                offset += size
+
+    def metrics(self):
+        """Métricas de latencia y tamaño de lote"""
+        sizes = np.fromiter(self.batch_sizes, dtype=np.float64) if self.batch_sizes else None
+        return {
+            'requests': self.request_latency.count,
+            'batches': self.batch_latency.count,
+            'request_latency_ms': self.request_latency.percentiles(),
+            'model_latency_ms': self.batch_latency.percentiles(),
+            'mean_batch_size': round(float(sizes.mean()), 2) if sizes is not None else None,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
+
+
+def _parse_customers(payload):
+    """Acepta un cliente, una lista de clientes o {'customers': [...]}"""
+    if isinstance(payload, dict) and 'customers' in payload:
+        payload = payload['customers']
+    if isinstance(payload, dict):
+        return [payload], True
+    if isinstance(payload, list) and all(isinstance(item, dict) for item in payload):
+        return payload, False
+    raise ValueError("Se esperaba un objeto de cliente o una lista de clientes")
+
+
+class ScoringServer:
+    """Servidor HTTP/1.1 mínimo sobre asyncio con endpoints /score, /metrics y /health"""
+
+    def __init__(self, batcher, host='127.0.0.1', port=8000):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+
+    async def _handle_score(self, body):
+        customers, single = _parse_customers(json.loads(body or b'null'))
+        predictions, probabilities = await self.batcher.score(assemble_feature_matrix(customers))
+
+        results = [
+            {'prediction': int(prediction), 'probability': float(probability)}
+            for prediction, probability in zip(predictions, probabilities)
+        ]
+        return results[0] if single else {'results': results}
+
+    async def _route(self, method, path, body):
+        if method == 'POST' and path == '/score':
+            return HTTPStatus.OK, await self._handle_score(body)
+        if method == 'GET' and path == '/metrics':
+            return HTTPStatus.OK, self.batcher.metrics()
+        if method == 'GET' and path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', 'features': MODEL_FEATURE_COLUMNS}
+        return HTTPStatus.NOT_FOUND, {'error': f'Ruta no encontrada: {method} {path}'}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+
+                try:
+                    status, payload = await self._route(method, path.split('?')[0], body)
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = HTTPStatus.BAD_REQUEST, {'error': str(e)}
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+                data = json.dumps(payload).encode('utf-8')
+                keep_alive = (headers.get('connection', '').lower() != 'close' and
+                              version == 'HTTP/1.1')
+                writer.write(
+                    f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                    f'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1')
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        self.batcher.start()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"Servidor de puntuación escuchando en http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
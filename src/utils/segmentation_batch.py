@@ -0,0 +1,172 @@
+"""
+Lógica vectorizada de segmentación compartida por los módulos de cada idioma
+
+Los umbrales y fórmulas son los de get_customer_segment,
+calculate_customer_value_score y get_campaign_budget_allocation; cada módulo
+(business_segmentation, business_segmentation_spanish) aporta solo sus
+nombres de segmento, iconos, colores y presupuestos.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def round_like_builtin(values, ndigits):
+    """
+    round() de Python sobre arrays
+
+    np.round coincide con round() salvo cuando el valor escalado queda muy
+    cerca de .5; esos casos se recalculan con round() para obtener
+    exactamente el mismo resultado que las funciones escalares.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, ndigits)
+    scaled = values * 10 ** ndigits
+    borderline = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if borderline.any():
+        rounded[borderline] = [round(float(v), ndigits) for v in values[borderline]]
+    return rounded
+
+
+def segment_batch(recency, frequency, monetary, probability, segment_styles):
+    """
+    Segmentación RFM + Probabilidad para arrays de clientes
+
+    Args:
+        recency, frequency, monetary, probability: Arrays por cliente
+        segment_styles (dict): Segmento -> (icono, color), con los ocho
+            segmentos en el orden de get_customer_segment (de Campeones a
+            Perdidos)
+
+    Returns:
+        tuple: (segmentos, iconos, colores) como arrays de objetos
+    """
+    (champions, loyal, potential, new, promising,
+     need_attention, at_risk, lost) = segment_styles
+
+    recency = np.asarray(recency)
+    frequency = np.asarray(frequency)
+    monetary = np.asarray(monetary)
+    probability = np.broadcast_to(np.asarray(probability, dtype=np.float64), recency.shape)
+
+    champions_tier = (recency <= 30) & (frequency >= 8) & (monetary >= 1000)
+    loyalists_tier = (recency <= 60) & (frequency >= 5) & (monetary >= 500)
+    promising_tier = (recency <= 90) & (frequency >= 3)
+    at_risk_tier = (recency > 90) & (frequency >= 2)
+
+    # Mismo orden de evaluación que get_customer_segment
+    segments = np.select(
+        [
+            champions_tier & (probability >= 0.8),
+            champions_tier,
+            loyalists_tier & (probability >= 0.7),
+            loyalists_tier,
+            promising_tier & (probability >= 0.6),
+            promising_tier,
+            at_risk_tier
+        ],
+        [champions, loyal, potential, new, promising, need_attention, at_risk],
+        default=lost
+    ).astype(object)
+
+    segment_series = pd.Series(segments, dtype=object)
+    icons = segment_series.map({segment: style[0] for segment, style in segment_styles.items()}).to_numpy()
+    colors = segment_series.map({segment: style[1] for segment, style in segment_styles.items()}).to_numpy()
+
+    return segments, icons, colors
+
+
+def value_score_batch(recency, frequency, monetary, probability):
+    """
+    Calcular puntuación de valor (0-100) para arrays de clientes
+    """
+    recency = np.asarray(recency, dtype=np.float64)
+    frequency = np.asarray(frequency, dtype=np.float64)
+    monetary = np.asarray(monetary, dtype=np.float64)
+    probability = np.asarray(probability, dtype=np.float64)
+
+    # Normalizar métricas (0-1); fmax/fmin ignoran NaN igual que max(0, nan)
+    # y min(1, nan) en la versión escalar, que devuelven el límite
+    recency_score = np.fmax(0, (365 - recency) / 365)
+    frequency_score = np.fmin(1, frequency / 20)
+    monetary_score = np.fmin(1, monetary / 5000)
+
+    total_score = (
+        probability * 0.4 +
+        monetary_score * 0.3 +
+        frequency_score * 0.2 +
+        recency_score * 0.1
+    ) * 100
+
+    return round_like_builtin(total_score, 1)
+
+
+def budget_allocation_batch(segments, customer_value_scores, base_budgets):
+    """
+    Sugerir presupuesto de campaña para arrays de clientes
+
+    Args:
+        segments: Segmento de cada cliente
+        customer_value_scores: Puntuación de valor de cada cliente
+        base_budgets (dict): Presupuesto base por segmento (5 si no aparece)
+    """
+    base = pd.Series(segments, dtype=object).map(base_budgets).fillna(5).to_numpy(dtype=np.float64)
+    scores = np.asarray(customer_value_scores, dtype=np.float64)
+
+    # Ajustar por valor del cliente
+    multiplier = np.select([scores >= 80, scores >= 60, scores >= 40], [1.5, 1.2, 1.0], default=0.7)
+
+    return round_like_builtin(base * multiplier, 2)
+
+
+def insights_batch(customers, segment_styles, base_budgets, get_recommendations):
+    """
+    Insights de todos los clientes de un DataFrame en una sola llamada
+
+    Args:
+        customers (pd.DataFrame): Columnas Recency, Frequency, Monetary y
+            opcionalmente probability (default 0.5)
+        segment_styles (dict): Segmento -> (icono, color) (ver segment_batch)
+        base_budgets (dict): Presupuesto base por segmento
+        get_recommendations (callable): get_business_recommendations del idioma
+
+    Returns:
+        pd.DataFrame: Segmento, puntuación de valor, riesgo y presupuesto por cliente
+    """
+    recency = customers['Recency'].to_numpy()
+    frequency = customers['Frequency'].to_numpy()
+    monetary = customers['Monetary'].to_numpy()
+    if 'probability' in customers.columns:
+        probability = customers['probability'].to_numpy(dtype=np.float64)
+    else:
+        probability = np.full(len(customers), 0.5)
+
+    segments, icons, colors = segment_batch(recency, frequency, monetary, probability, segment_styles)
+    value_scores = value_score_batch(recency, frequency, monetary, probability)
+    budgets = budget_allocation_batch(segments, value_scores, base_budgets)
+
+    # Análisis de riesgo
+    risk_level = np.select([recency > 180, recency > 90], ["Alto", "Medio"], default="Bajo").astype(object)
+    risk_color = np.select([recency > 180, recency > 90], ["#dc3545", "#ffc107"], default="#28a745").astype(object)
+
+    # Prioridad y ROI por segmento (una consulta por segmento, no por cliente)
+    segment_series = pd.Series(segments, dtype=object)
+    recommendations = {
+        segment: get_recommendations(segment, None, None, None, None)
+        for segment in segment_series.unique()
+    }
+    priorities = {segment: rec["priority"] for segment, rec in recommendations.items()}
+    expected_roi = {segment: rec["roi_expected"] for segment, rec in recommendations.items()}
+
+    return pd.DataFrame({
+        "segment": segments,
+        "segment_icon": icons,
+        "segment_color": colors,
+        "probability": probability,
+        "value_score": value_scores,
+        "risk_level": risk_level,
+        "risk_color": risk_color,
+        "suggested_budget": budgets,
+        "campaign_priority": segment_series.map(priorities).to_numpy(),
+        "expected_roi": segment_series.map(expected_roi).to_numpy()
+    }, index=customers.index)
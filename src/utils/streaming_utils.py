@@ -0,0 +1,136 @@
+"""
+Ingesta por bloques con memoria acotada para el dataset de transacciones
+"""
+
+from datetime import timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from utils.data_utils import clean_retail_data
+
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Tipos de lectura para exportaciones CSV: los códigos se leen como texto
+# para que todos los bloques tengan el mismo tipo
+CSV_DTYPES = {
+    'InvoiceNo': str,
+    'StockCode': str,
+    'Description': str,
+    'Country': str
+}
+
+
+def _iter_excel_chunks(file_path, chunksize):
+    """Leer un Excel fila a fila en modo solo lectura y agrupar en bloques"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns = [str(col) for col in header]
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame.from_records(buffer, columns=columns)
+                buffer = []
+
+        if buffer:
+            yield pd.DataFrame.from_records(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_retail_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Lee un archivo de transacciones (XLSX o CSV) por bloques
+
+    Args:
+        file_path (str): Ruta al archivo (.xlsx o .csv)
+        chunksize (int): Número de filas por bloque
+
+    Yields:
+        pd.DataFrame: Bloque de transacciones en bruto
+    """
+    suffix = Path(file_path).suffix.lower()
+
+    if suffix in ('.xlsx', '.xlsm'):
+        yield from _iter_excel_chunks(file_path, chunksize)
+    elif suffix in ('.csv', '.gz', '.zip'):
+        yield from pd.read_csv(file_path, chunksize=chunksize, dtype=CSV_DTYPES)
+    else:
+        raise ValueError(f"Formato no soportado para ingesta por bloques: {suffix}")
+
+
+def iter_clean_retail_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE, rules=None):
+    """
+    Lee un archivo de transacciones por bloques aplicando la limpieza a cada uno
+
+    Args:
+        file_path (str): Ruta al archivo (.xlsx o .csv)
+        chunksize (int): Número de filas por bloque
+        rules (dict): Reglas de limpieza (default: CLEANING_RULES)
+
+    Yields:
+        pd.DataFrame: Bloque de transacciones limpio con columna Revenue
+    """
+    for chunk in iter_retail_chunks(file_path, chunksize):
+        chunk_clean = clean_retail_data(chunk, rules)
+        if not chunk_clean.empty:
+            yield chunk_clean
+
+
+def stream_rfm_metrics(chunks, customer_col='CustomerID', date_col='InvoiceDate',
+                       revenue_col='Revenue', invoice_col='InvoiceNo'):
+    """
+    Calcula métricas RFM a partir de bloques de transacciones limpias
+
+    De cada bloque solo se guardan sus agregados por cliente y sus pares
+    cliente-factura distintos, que se combinan una sola vez al final, así
+    que el coste es lineal en el número de bloques y la memoria no depende
+    del número de filas.
+
+    Args:
+        chunks (iterable): Bloques limpios (p. ej. iter_clean_retail_chunks)
+        customer_col (str): Nombre de la columna de cliente
+        date_col (str): Nombre de la columna de fecha
+        revenue_col (str): Nombre de la columna de ingresos
+        invoice_col (str): Nombre de la columna de factura
+
+    Returns:
+        pd.DataFrame: Métricas RFM por cliente (mismo formato que calculate_rfm_metrics)
+    """
+    chunk_last = []
+    chunk_monetary = []
+    chunk_invoices = []
+
+    for chunk in chunks:
+        grouped = chunk.groupby(customer_col)
+        chunk_last.append(grouped[date_col].max())
+        chunk_monetary.append(grouped[revenue_col].sum())
+        chunk_invoices.append(chunk[[customer_col, invoice_col]].astype({invoice_col: str}).drop_duplicates())
+
+    if not chunk_last:
+        return pd.DataFrame(columns=[customer_col, 'Recency', 'Frequency', 'Monetary'])
+
+    # Una factura puede repartirse entre dos bloques: se deduplica una vez al final
+    last_purchase = pd.concat(chunk_last).groupby(level=0).max()
+    monetary = pd.concat(chunk_monetary).groupby(level=0).sum()
+    invoices = pd.concat(chunk_invoices, ignore_index=True).drop_duplicates()
+
+    reference_date = last_purchase.max() + timedelta(days=1)
+
+    rfm = pd.DataFrame({
+        'Recency': (reference_date - last_purchase).dt.days,
+        'Frequency': invoices.groupby(customer_col).size(),
+        'Monetary': monetary
+    }).sort_index()
+    rfm.index.name = customer_col
+
+    return rfm.reset_index()
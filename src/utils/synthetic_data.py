@@ -0,0 +1,225 @@
+"""
+Generador sintético y vectorizado de transacciones con el esquema de Online Retail
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+ONLINE_RETAIL_COLUMNS = [
+    'InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate',
+    'UnitPrice', 'CustomerID', 'Country'
+]
+
+# Reparto aproximado de países del dataset original
+DEFAULT_COUNTRY_WEIGHTS = {
+    'United Kingdom': 0.89, 'Germany': 0.02, 'France': 0.02, 'EIRE': 0.015,
+    'Spain': 0.01, 'Netherlands': 0.01, 'Belgium': 0.008, 'Switzerland': 0.007,
+    'Portugal': 0.005, 'Australia': 0.005
+}
+
+# Peso relativo de cada mes (pico antes de Navidad) y de cada día de la semana
+# (lunes a domingo; el dataset original no tiene ventas en sábado)
+MONTH_WEIGHTS = np.array([0.7, 0.65, 0.8, 0.75, 0.85, 0.85, 0.85, 0.9, 1.2, 1.4, 1.7, 1.1])
+WEEKDAY_WEIGHTS = np.array([1.0, 1.1, 1.15, 1.2, 0.9, 0.0, 0.7])
+
+FIRST_INVOICE_NO = 536365
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+class OnlineRetailGenerator:
+    """
+    Generador reproducible de transacciones de comercio electrónico
+
+    La actividad de los clientes y la popularidad de los productos siguen una
+    ley de potencias (Zipf), las fechas tienen estacionalidad mensual y
+    semanal, y una parte de las facturas son cancelaciones ('C' + número,
+    cantidades negativas) o no tienen CustomerID, como en el dataset real.
+    Las tablas de clientes y productos se fijan con la semilla; cada bloque
+    usa su propia semilla derivada, así que el bloque i es siempre el mismo
+    independientemente de cuántos se generen.
+    """
+
+    def __init__(self, n_customers=4372, n_products=3684, start_date='2010-12-01',
+                 end_date='2011-12-09', activity_exponent=1.1, popularity_exponent=1.05,
+                 mean_lines_per_invoice=20, cancellation_rate=0.017, missing_customer_rate=0.25,
+                 country_weights=None, seed=42):
+        self.n_customers = n_customers
+        self.n_products = n_products
+        self.mean_lines_per_invoice = mean_lines_per_invoice
+        self.cancellation_rate = cancellation_rate
+        self.missing_customer_rate = missing_customer_rate
+        self.seed = seed
+
+        rng = np.random.default_rng(np.random.SeedSequence([seed, 0]))
+        country_weights = country_weights or DEFAULT_COUNTRY_WEIGHTS
+        self.countries = np.array(list(country_weights))
+        self._country_cdf = _cdf(np.array(list(country_weights.values())))
+
+        # Clientes: actividad Zipf con el orden barajado para no ligarla al ID
+        self.customer_ids = np.arange(12346, 12346 + n_customers, dtype=np.float64)
+        self._customer_cdf = _cdf(rng.permutation(_zipf_weights(n_customers, activity_exponent)))
+        self._customer_country = np.searchsorted(self._country_cdf, rng.random(n_customers))
+
+        # Productos: popularidad Zipf y precio fijo log-normal por producto
+        codes = (10000 + rng.permutation(90000)[:n_products]).astype(str)
+        suffixes = np.where(rng.random(n_products) < 0.15,
+                            rng.choice(list('ABCDEFG'), n_products), '')
+        self.stock_codes = np.char.add(codes, suffixes).astype(object)
+        self.descriptions = np.char.add('PRODUCT ', self.stock_codes.astype(str)).astype(object)
+        self.unit_prices = np.round(rng.lognormal(1.0, 0.9, n_products) + 0.05, 2)
+        self._product_cdf = _cdf(rng.permutation(_zipf_weights(n_products, popularity_exponent)))
+
+        # Días del periodo con pesos de estacionalidad
+        self._days = pd.date_range(start_date, end_date, freq='D').to_numpy(dtype='datetime64[ns]')
+        days = pd.DatetimeIndex(self._days)
+        self._day_cdf = _cdf(MONTH_WEIGHTS[days.month - 1] * WEEKDAY_WEIGHTS[days.dayofweek])
+
+    def generate_chunk(self, n_rows, chunk_index=0, first_invoice=FIRST_INVOICE_NO):
+        """
+        Genera un bloque de n_rows líneas de factura
+
+        Args:
+            n_rows (int): Líneas del bloque
+            chunk_index (int): Índice del bloque (fija su semilla)
+            first_invoice (int): Número de la primera factura del bloque
+
+        Returns:
+            pd.DataFrame: Transacciones con ONLINE_RETAIL_COLUMNS ordenadas por fecha
+        """
+        rng = np.random.default_rng(np.random.SeedSequence([self.seed, 1, chunk_index]))
+
+        # Facturas con número de líneas geométrico hasta cubrir n_rows
+        estimate = int(n_rows / self.mean_lines_per_invoice * 1.2) + 16
+        sizes = rng.geometric(1 / self.mean_lines_per_invoice, estimate)
+        while sizes.sum() < n_rows:
+            sizes = np.concatenate([sizes, rng.geometric(1 / self.mean_lines_per_invoice, estimate)])
+        n_invoices = int(np.searchsorted(np.cumsum(sizes), n_rows)) + 1
+        sizes = sizes[:n_invoices]
+        sizes[-1] -= sizes.sum() - n_rows
+
+        # Atributos por factura
+        invoice_dates = (self._days[np.searchsorted(self._day_cdf, rng.random(n_invoices))]
+                         + ((8 * 60 + rng.integers(0, 12 * 60, n_invoices)) * 60_000_000_000)
+                         .astype('timedelta64[ns]'))
+        order = np.argsort(invoice_dates, kind='stable')
+        invoice_dates = invoice_dates[order]
+        sizes = sizes[order]
+
+        customers = np.searchsorted(self._customer_cdf, rng.random(n_invoices))
+        countries = self._customer_country[customers]
+        missing = rng.random(n_invoices) < self.missing_customer_rate
+        countries[missing] = np.searchsorted(self._country_cdf, rng.random(int(missing.sum())))
+        customer_ids = np.where(missing, np.nan, self.customer_ids[customers])
+        cancelled = rng.random(n_invoices) < self.cancellation_rate
+
+        invoice_numbers = np.arange(first_invoice, first_invoice + n_invoices).astype(str)
+        invoice_numbers = np.where(cancelled, np.char.add('C', invoice_numbers), invoice_numbers)
+
+        # Expandir a líneas
+        products = np.searchsorted(self._product_cdf, rng.random(n_rows))
+        quantity = rng.geometric(0.3, n_rows) * np.where(rng.random(n_rows) < 0.05, 12, 1)
+        line_cancelled = np.repeat(cancelled, sizes)
+
+        return pd.DataFrame({
+            'InvoiceNo': np.repeat(invoice_numbers, sizes).astype(object),
+            'StockCode': self.stock_codes[products],
+            'Description': self.descriptions[products],
+            'Quantity': np.where(line_cancelled, -quantity, quantity),
+            'InvoiceDate': np.repeat(invoice_dates, sizes),
+            'UnitPrice': self.unit_prices[products],
+            'CustomerID': np.repeat(customer_ids, sizes),
+            'Country': self.countries[np.repeat(countries, sizes)].astype(object)
+        })[ONLINE_RETAIL_COLUMNS]
+
+    def iter_chunks(self, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        Genera n_rows líneas en bloques de chunk_rows
+
+        Yields:
+            pd.DataFrame: Bloque de transacciones
+        """
+        first_invoice = FIRST_INVOICE_NO
+        for chunk_index, start in enumerate(range(0, n_rows, chunk_rows)):
+            chunk = self.generate_chunk(min(chunk_rows, n_rows - start), chunk_index, first_invoice)
+            first_invoice += chunk['InvoiceNo'].nunique()
+            yield chunk
+
+
+def _zipf_weights(n, exponent):
+    return 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+
+
+def _cdf(weights):
+    cdf = np.cumsum(weights, dtype=np.float64)
+    cdf /= cdf[-1]
+    return cdf
+
+
+def generate_online_retail(n_rows, n_customers=None, seed=42, **kwargs):
+    """
+    Transacciones sintéticas en memoria con el esquema de Online Retail
+
+    Args:
+        n_rows (int): Número de líneas
+        n_customers (int): Clientes distintos (default: una por cada ~125 líneas,
+            como en el dataset original)
+        seed (int): Semilla
+        **kwargs: Otros parámetros de OnlineRetailGenerator
+
+    Returns:
+        pd.DataFrame: Transacciones en bruto
+    """
+    n_customers = n_customers or max(100, n_rows // 125)
+    generator = OnlineRetailGenerator(n_customers=n_customers, seed=seed, **kwargs)
+    return pd.concat(generator.iter_chunks(n_rows), ignore_index=True)
+
+
+def write_online_retail(output_path, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS, n_customers=None,
+                        seed=42, **kwargs):
+    """
+    Escribe transacciones sintéticas por bloques en Parquet o CSV
+
+    La memoria queda acotada por chunk_rows, así que se pueden generar
+    cientos de millones de filas.
+
+    Args:
+        output_path (str): Archivo .parquet o .csv
+        n_rows (int): Número total de líneas
+        chunk_rows (int): Líneas por bloque
+        n_customers (int): Clientes distintos (default: n_rows // 125)
+        seed (int): Semilla
+        **kwargs: Otros parámetros de OnlineRetailGenerator
+
+    Returns:
+        dict: Filas y bloques escritos
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    n_customers = n_customers or max(100, n_rows // 125)
+    generator = OnlineRetailGenerator(n_customers=n_customers, seed=seed, **kwargs)
+    is_parquet = output_path.suffix.lower() in ('.parquet', '.pq')
+
+    writer = None
+    n_chunks = 0
+    try:
+        for chunk in generator.iter_chunks(n_rows, chunk_rows):
+            if is_parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(output_path, mode='w' if n_chunks == 0 else 'a',
+                             header=(n_chunks == 0), index=False)
+            n_chunks += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return {'rows': n_rows, 'chunks': n_chunks, 'path': str(output_path)}
@@ -0,0 +1,108 @@
+"""
+Agregación de tendencias a varias granularidades (semana, mes, trimestre) con caché
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Granularidad -> (frecuencia de periodo de pandas, nombre de la columna de periodo)
+GRANULARITIES = {
+    'W': ('W', 'year_week'),
+    'M': ('M', 'year_month'),
+    'Q': ('Q', 'year_quarter')
+}
+
+
+class TrendsAggregator:
+    """
+    Agregados de tendencias por semana, mes o trimestre
+
+    Acepta tanto la salida de create_synthetic_trends_data (columna date)
+    como la de get_google_trends_data (DatetimeIndex). Cada granularidad se
+    agrega una sola vez y se guarda en caché, igual que sus variantes con
+    retardos y medias móviles, para que los experimentos sobre varias
+    granularidades no repitan el trabajo. Cada llamada devuelve una copia,
+    así que modificar el resultado no altera la caché.
+    """
+
+    def __init__(self, trends_data):
+        data = trends_data
+        if 'date' in data.columns:
+            data = data.set_index('date')
+        data = data.select_dtypes(include='number').astype(np.float64)
+        data.index = pd.DatetimeIndex(pd.to_datetime(data.index), name='date')
+        self.data = data.sort_index()
+        self.trends_columns = list(self.data.columns)
+        self._regular = {}
+        self._cache = {}
+
+    def _regular_periods(self, granularity):
+        """Medias por periodo sobre un rango continuo (NaN en los periodos sin datos)"""
+        if granularity not in self._regular:
+            if granularity not in GRANULARITIES:
+                raise ValueError(f"Granularidad no soportada: {granularity} (usar W, M o Q)")
+            freq, _ = GRANULARITIES[granularity]
+            periods = self.data.index.to_period(freq)
+            means = self.data.groupby(periods).mean()
+            if len(means):
+                means = means.reindex(pd.period_range(means.index.min(), means.index.max(), freq=freq))
+            self._regular[granularity] = means
+        return self._regular[granularity]
+
+    def aggregate(self, granularity='M'):
+        """
+        Media de cada tendencia por periodo
+
+        Args:
+            granularity (str): 'W', 'M' o 'Q'
+
+        Returns:
+            pd.DataFrame: Columna de periodo (year_week, year_month o
+                year_quarter, como texto) y una columna por tendencia
+        """
+        key = ('aggregate', granularity)
+        if key not in self._cache:
+            regular = self._regular_periods(granularity)
+            present = regular.dropna(how='all')
+            result = present.reset_index(drop=True)
+            result.insert(0, GRANULARITIES[granularity][1], present.index.astype(str))
+            self._cache[key] = result
+        return self._cache[key].copy()
+
+    def with_lags(self, granularity='M', lags=(1, 2), windows=(3,)):
+        """
+        Agregados con retardos y medias móviles por tendencia
+
+        Los retardos y ventanas se calculan sobre la serie de periodos
+        continua, de modo que un periodo sin datos no desplaza los retardos.
+
+        Args:
+            granularity (str): 'W', 'M' o 'Q'
+            lags (tuple): Retardos en periodos ({col}_lag{k})
+            windows (tuple): Ventanas de media móvil en periodos ({col}_roll{w})
+
+        Returns:
+            pd.DataFrame: Salida de aggregate() con las columnas derivadas
+        """
+        key = ('lags', granularity, tuple(lags), tuple(windows))
+        if key not in self._cache:
+            regular = self._regular_periods(granularity)
+            values = regular[self.trends_columns]
+
+            derived = [values]
+            for lag in lags:
+                derived.append(values.shift(lag).add_suffix(f'_lag{lag}'))
+            for window in windows:
+                derived.append(values.rolling(window, min_periods=window).mean().add_suffix(f'_roll{window}'))
+            features = pd.concat(derived, axis=1)
+
+            present = features[regular.notna().any(axis=1)]
+            result = present.reset_index(drop=True)
+            result.insert(0, GRANULARITIES[granularity][1], present.index.astype(str))
+            self._cache[key] = result
+        return self._cache[key].copy()
+
+    def clear_cache(self):
+        self._regular.clear()
+        self._cache.clear()
@@ -0,0 +1,350 @@
+"""
+Descarga concurrente de Google Trends con caché en disco, límite de peticiones y backends intercambiables
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_TRENDS_CACHE_DIR = 'data/processed/cache/trends'
+
+
+def trends_column_name(keyword):
+    """Nombre de columna usado en todo el proyecto para una palabra clave"""
+    return f'trends_{keyword.replace(" ", "_")}'
+
+
+# Unidades de los timeframes relativos de pytrends ('today 5-y', 'now 7-d', ...)
+_RELATIVE_UNITS = {'y': 'years', 'm': 'months', 'd': 'days', 'H': 'hours'}
+
+
+def resolve_timeframe(timeframe, now=None):
+    """
+    Timeframe absoluto equivalente a uno relativo, para usarlo como clave de caché
+
+    'today N-u' se resuelve a fechas ('YYYY-MM-DD YYYY-MM-DD') y 'now N-u' a
+    horas ('YYYY-MM-DDTHH YYYY-MM-DDTHH'), así que una descarga relativa se
+    reutiliza como mucho durante ese día u hora. 'all' se fija al día actual.
+    Los timeframes absolutos se devuelven sin cambios.
+
+    Args:
+        timeframe (str): Timeframe de pytrends
+        now (pd.Timestamp): Instante de referencia (default: ahora)
+
+    Returns:
+        str: Timeframe absoluto
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    parts = timeframe.split()
+    if timeframe.strip() == 'all':
+        return f"all {now:%Y-%m-%d}"
+    if len(parts) != 2 or parts[0] not in ('today', 'now'):
+        return timeframe
+
+    amount, _, unit = parts[1].partition('-')
+    if not amount.isdigit() or unit not in _RELATIVE_UNITS:
+        return timeframe
+    if parts[0] == 'today':
+        end = now.normalize()
+        start = end - pd.DateOffset(**{_RELATIVE_UNITS[unit]: int(amount)})
+        return f"{start:%Y-%m-%d} {end:%Y-%m-%d}"
+    end = now.floor('h')
+    start = end - pd.DateOffset(**{_RELATIVE_UNITS[unit]: int(amount)})
+    return f"{start:%Y-%m-%dT%H} {end:%Y-%m-%dT%H}"
+
+
+class TokenBucket:
+    """
+    Limitador de peticiones tipo token bucket seguro entre hilos
+
+    Se reponen rate tokens por segundo hasta capacity; cada petición consume
+    uno y espera si no hay disponibles.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PyTrendsBackend:
+    """Backend real sobre pytrends (se importa solo al usarlo)"""
+
+    def __init__(self, hl='en-US', tz=360):
+        self.hl = hl
+        self.tz = tz
+        self._local = threading.local()
+
+    def _client(self):
+        # TrendReq mantiene sesión y cookies: una instancia por hilo
+        if not hasattr(self._local, 'client'):
+            from pytrends.request import TrendReq
+            self._local.client = TrendReq(hl=self.hl, tz=self.tz)
+        return self._local.client
+
+    def fetch(self, keywords, timeframe, geo):
+        """
+        Interés a lo largo del tiempo de hasta 5 términos en una petición
+
+        Returns:
+            pd.DataFrame: Una columna por término (nombre original) e índice de fechas
+        """
+        client = self._client()
+        client.build_payload(list(keywords), cat=0, timeframe=timeframe, geo=geo, gprop='')
+        interest_over_time = client.interest_over_time()
+        return interest_over_time.drop('isPartial', axis=1, errors='ignore')
+
+
+class LocalFileBackend:
+    """
+    Sustituto local de Google Trends a partir de un archivo con series de volumen
+
+    El archivo (CSV o Parquet) tiene una columna date y una columna por
+    término, con el nombre original o con prefijo trends_ (por ejemplo la
+    salida de create_synthetic_trends_data). Como la API real, cada petición
+    se normaliza para que el máximo de los términos pedidos en el periodo sea
+    100 y se redondea a enteros.
+    """
+
+    def __init__(self, file_path, normalize=True):
+        self.file_path = Path(file_path)
+        self.normalize = normalize
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._data is None:
+                if self.file_path.suffix.lower() in ('.parquet', '.pq'):
+                    data = pd.read_parquet(self.file_path)
+                else:
+                    data = pd.read_csv(self.file_path)
+                data['date'] = pd.to_datetime(data['date'])
+                self._data = data.set_index('date').sort_index()
+        return self._data
+
+    def fetch(self, keywords, timeframe, geo):
+        data = self._load()
+
+        parts = timeframe.split()
+        if len(parts) == 2:
+            data = data.loc[parts[0]:parts[1]]
+
+        columns = {}
+        for keyword in keywords:
+            if keyword in data.columns:
+                columns[keyword] = data[keyword]
+            elif trends_column_name(keyword) in data.columns:
+                columns[keyword] = data[trends_column_name(keyword)]
+            else:
+                raise KeyError(f"Término no disponible en {self.file_path.name}: {keyword}")
+
+        result = pd.DataFrame(columns, index=data.index).astype(np.float64)
+        if self.normalize and not result.empty:
+            peak = np.nanmax(result.to_numpy())
+            if peak > 0:
+                result = (result * (100.0 / peak)).round()
+        return result
+
+
+class TrendsFetcher:
+    """
+    Motor de descarga de Google Trends
+
+    Cada petición (términos, timeframe, geo) se busca primero en la caché de
+    disco (los timeframes relativos como 'today 5-y' se resuelven a fechas,
+    así que caducan con el día); si no está, se lanza en un pool de hilos acotado, pasando por el
+    token bucket y reintentando con espera exponencial. El resultado ancho se
+    ensambla con una sola concatenación.
+    """
+
+    def __init__(self, backend=None, cache_dir=DEFAULT_TRENDS_CACHE_DIR, max_workers=4,
+                 requests_per_second=0.5, burst=2, retries=3, backoff_seconds=5.0):
+        self.backend = backend if backend is not None else PyTrendsBackend()
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.stats = {'requests': 0, 'cache_hits': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _cache_file(self, keywords, timeframe, geo):
+        # Los timeframes relativos se resuelven para que la caché no los congele
+        key = json.dumps([list(keywords), resolve_timeframe(timeframe), geo])
+        return self.cache_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]}.parquet"
+
+    def fetch_request(self, keywords, timeframe, geo):
+        """
+        Una petición al backend con caché, límite de peticiones y reintentos
+
+        Args:
+            keywords (tuple): Términos de la petición (hasta 5)
+            timeframe (str): Período de tiempo (formato: 'YYYY-MM-DD YYYY-MM-DD')
+            geo (str): Código de país
+
+        Returns:
+            pd.DataFrame: Columnas con el nombre original de cada término
+                (vacío si la petición falla tras los reintentos)
+        """
+        keywords = tuple(keywords)
+        cache_file = self._cache_file(keywords, timeframe, geo) if self.cache_dir else None
+
+        if cache_file is not None and cache_file.exists():
+            try:
+                result = pd.read_parquet(cache_file)
+                self._count('cache_hits')
+                return result
+            except Exception as e:
+                print(f"Caché ilegible, se vuelve a descargar ({cache_file.name}): {e}")
+
+        for attempt in range(1, self.retries + 1):
+            self.rate_limiter.acquire()
+            self._count('requests')
+            try:
+                result = self.backend.fetch(keywords, timeframe, geo)
+                break
+            except Exception as e:
+                print(f"Error obteniendo datos para {list(keywords)} (intento {attempt}): {e}")
+                if attempt < self.retries:
+                    time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+        else:
+            self._count('failures')
+            return pd.DataFrame()
+
+        result.index.name = 'date'
+        if cache_file is not None and not result.empty:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                # Escritura atómica para no dejar cachés a medias
+                tmp_file = cache_file.with_suffix('.parquet.tmp')
+                result.to_parquet(tmp_file, index=True)
+                tmp_file.replace(cache_file)
+            except Exception as e:
+                print(f"No se pudo escribir la caché ({cache_file.name}): {e}")
+
+        print(f"Datos obtenidos para {list(keywords)}")
+        return result
+
+    def fetch_many(self, requests, timeframe, geo):
+        """Lanza varias peticiones en paralelo y devuelve sus resultados en orden"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda keywords: self.fetch_request(keywords, timeframe, geo),
+                                     requests))
+
+    def fetch(self, keywords, timeframe, geo='GB'):
+        """
+        Datos de tendencias de cada palabra clave, una petición por término
+
+        Args:
+            keywords (list): Lista de términos de búsqueda
+            timeframe (str): Período de tiempo (formato: 'YYYY-MM-DD YYYY-MM-DD')
+            geo (str): Código de país
+
+        Returns:
+            pd.DataFrame: Columnas trends_<término> con fechas como índice
+        """
+        results = self.fetch_many([(keyword,) for keyword in keywords], timeframe, geo)
+        frames = [
+            result[[keyword]].rename(columns={keyword: trends_column_name(keyword)})
+            for keyword, result in zip(keywords, results) if not result.empty
+        ]
+        if not frames:
+            return pd.DataFrame()
+
+        trends_data = pd.concat(frames, axis=1, join='outer').sort_index()
+        trends_data.index.name = 'date'
+        return trends_data
+
+    def fetch_batched(self, keywords, timeframe, geo='GB', anchor=None, batch_size=5):
+        """
+        Datos de tendencias pidiendo hasta batch_size términos por petición
+
+        Google Trends normaliza cada petición a su propio máximo (100), así que
+        los lotes no son comparables entre sí. Todos los lotes incluyen un
+        término ancla común; cada lote se reescala por el cociente entre el
+        volumen del ancla en el lote de referencia (el primero en el que el
+        ancla tiene volumen) y en ese lote, y al final los términos pedidos se
+        normalizan para que su máximo global sea 100. Los lotes en los que el
+        ancla no tiene volumen en las fechas comunes no se pueden reescalar y
+        se omiten con un aviso.
+
+        Args:
+            keywords (list): Lista de términos de búsqueda
+            timeframe (str): Período de tiempo (formato: 'YYYY-MM-DD YYYY-MM-DD')
+            geo (str): Código de país
+            anchor (str): Término ancla (default: el primero de keywords)
+            batch_size (int): Términos por petición, ancla incluida (máximo 5 en la API)
+
+        Returns:
+            pd.DataFrame: Columnas trends_<término> en una escala común con fechas como índice
+        """
+        anchor = anchor if anchor is not None else keywords[0]
+        others = [keyword for keyword in keywords if keyword != anchor]
+        step = batch_size - 1
+        batches = [(anchor, *others[i:i + step]) for i in range(0, len(others), step)] or [(anchor,)]
+
+        results = [result for result in self.fetch_many(batches, timeframe, geo) if not result.empty]
+        if not results:
+            return pd.DataFrame()
+
+        # Referencia: el primer lote en el que el ancla tiene volumen
+        reference_result = next((result for result in results if result[anchor].sum() > 0), None)
+        if reference_result is None:
+            print(f"El ancla '{anchor}' no tiene volumen en ningún lote; no se pueden reescalar")
+            reference_result = results[0]
+        reference = reference_result[anchor]
+
+        frames = []
+        for result in results:
+            # Escalar el lote a la escala de la referencia usando las fechas comunes del ancla
+            common = reference.index.intersection(result.index)
+            reference_total = reference.loc[common].sum()
+            anchor_total = result.loc[common, anchor].sum()
+            if result is reference_result:
+                scale = 1.0
+            elif reference_total > 0 and anchor_total > 0:
+                scale = reference_total / anchor_total
+            else:
+                others_in_batch = [col for col in result.columns if col != anchor]
+                print(f"El ancla '{anchor}' no tiene volumen en las fechas comunes del lote "
+                      f"{others_in_batch}; se omite")
+                continue
+            frames.append(result.drop(columns=anchor).astype(np.float64) * scale)
+        frames.insert(0, reference.astype(np.float64).to_frame())
+
+        # Una sola concatenación y normalización a 0-100 sobre los términos pedidos
+        combined = pd.concat(frames, axis=1, join='outer').sort_index()
+        trends_data = combined[[keyword for keyword in keywords if keyword in combined.columns]]
+        peak = np.nanmax(trends_data.to_numpy()) if trends_data.size else np.nan
+        if peak > 0:
+            trends_data = trends_data * (100.0 / peak)
+
+        trends_data.columns = [trends_column_name(keyword) for keyword in trends_data.columns]
+        trends_data.index.name = 'date'
+        return trends_data
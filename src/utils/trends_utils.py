@@ -4,64 +4,44 @@ Utilidades para integración con Google Trends
 
 import pandas as pd
 import numpy as np
-from pytrends.request import TrendReq
-import time
 from datetime import datetime
+from scipy import sparse
 
+from utils.instrumentation import instrumented
+from utils.trends_aggregation import TrendsAggregator
+from utils.trends_fetcher import TrendsFetcher
 
-def get_google_trends_data(keywords, timeframe, geo='GB', retries=3):
+
+@instrumented
+def get_google_trends_data(keywords, timeframe, geo='GB', retries=3, fetcher=None, batched=False):
     """
     Obtiene datos de Google Trends para una lista de palabras clave
     
+    Las peticiones se lanzan en paralelo con caché en disco y límite de
+    peticiones (ver utils.trends_fetcher.TrendsFetcher).
+    
     Args:
         keywords (list): Lista de términos de búsqueda
         timeframe (str): Período de tiempo (formato: 'YYYY-MM-DD YYYY-MM-DD')
         geo (str): Código de país (default: 'GB' para Reino Unido)
         retries (int): Número de reintentos en caso de error
+        fetcher (TrendsFetcher): Motor de descarga a usar (default: pytrends)
+        batched (bool): Pedir hasta 5 términos por petición con un ancla común
+            y reescalar todos a la misma escala (ver TrendsFetcher.fetch_batched)
         
     Returns:
         pd.DataFrame: Datos de tendencias con fechas como índice
     """
-    pytrends = TrendReq(hl='en-US', tz=360)
-    trends_data = pd.DataFrame()
+    if fetcher is None:
+        fetcher = TrendsFetcher(retries=retries)
     
-    for keyword in keywords:
-        success = False
-        attempts = 0
-        
-        while not success and attempts < retries:
-            try:
-                # Configurar búsqueda
-                pytrends.build_payload([keyword], cat=0, timeframe=timeframe, geo=geo, gprop='')
-                
-                # Obtener datos de interés a lo largo del tiempo
-                interest_over_time = pytrends.interest_over_time()
-                
-                if not interest_over_time.empty:
-                    # Limpiar y renombrar
-                    interest_over_time = interest_over_time.drop('isPartial', axis=1, errors='ignore')
-                    interest_over_time.columns = [f'trends_{keyword.replace(" ", "_")}']
-                    
-                    if trends_data.empty:
-                        trends_data = interest_over_time
-                    else:
-                        trends_data = trends_data.join(interest_over_time, how='outer')
-                
-                success = True
-                print(f"Datos obtenidos para '{keyword}'")
-                
-            except Exception as e:
-                attempts += 1
-                print(f"Error obteniendo datos para '{keyword}' (intento {attempts}): {e}")
-                if attempts < retries:
-                    time.sleep(5)  # Esperar antes de reintentar
-            
-            # Pausa para evitar límites de API
-            time.sleep(2)
+    if batched:
+        return fetcher.fetch_batched(keywords, timeframe, geo)
     
-    return trends_data
+    return fetcher.fetch(keywords, timeframe, geo)
 
 
+@instrumented
 def aggregate_trends_monthly(trends_data):
     """
     Agrega datos de tendencias por mes
@@ -75,17 +55,11 @@ def aggregate_trends_monthly(trends_data):
     if trends_data.empty:
         return pd.DataFrame()
     
-    trends_monthly = trends_data.reset_index()
-    trends_monthly['date'] = pd.to_datetime(trends_monthly['date'])
-    trends_monthly['year_month'] = trends_monthly['date'].dt.to_period('M')
-    
-    # Agregar por mes
-    trends_monthly_agg = trends_monthly.groupby('year_month').mean().reset_index()
-    trends_monthly_agg['year_month'] = trends_monthly_agg['year_month'].astype(str)
-    
-    return trends_monthly_agg
+    # Agregar por mes sobre el DatetimeIndex (ver TrendsAggregator para semanas y trimestres)
+    return TrendsAggregator(trends_data).aggregate('M').copy()
 
 
+@instrumented
 def create_synthetic_trends_data(start_date, end_date, keywords):
     """
     Crea datos sintéticos de tendencias para demostración
@@ -112,17 +86,17 @@ def create_synthetic_trends_data(start_date, end_date, keywords):
     return trends_data
 
 
-def merge_trends_with_customers(customer_data, trends_data, transaction_data):
+@instrumented
+def calculate_customer_trends_features(trends_data, transaction_data):
     """
-    Combina datos de tendencias con información de clientes
+    Calcula media, desviación y máximo de cada tendencia en los meses activos del cliente
     
     Args:
-        customer_data (pd.DataFrame): Datos de clientes
         trends_data (pd.DataFrame): Datos de tendencias agregados por mes
         transaction_data (pd.DataFrame): Datos de transacciones
         
     Returns:
-        pd.DataFrame: Dataset combinado con características de tendencias
+        pd.DataFrame: Características de tendencias por cliente (sin imputar)
     """
     # Agregar año-mes a las transacciones
     transaction_data = transaction_data.copy()
@@ -154,17 +128,117 @@ def merge_trends_with_customers(customer_data, trends_data, transaction_data):
     
     customer_trends_features.columns = new_columns
     
+    return customer_trends_features
+
+
+@instrumented
+def calculate_customer_trends_features_sparse(trends_data, transaction_data):
+    """
+    Versión con matrices dispersas de calculate_customer_trends_features
+    
+    La actividad se representa como una matriz binaria dispersa cliente x mes
+    sobre códigos enteros de periodo. Conteos y sumas de todas las tendencias
+    salen de dos productos matriz-matriz con la tabla de tendencias
+    enmascarada; la desviación (en dos pasadas) y el máximo se reducen por
+    filas sobre los elementos no nulos de la matriz CSR.
+    
+    Args:
+        trends_data (pd.DataFrame): Datos de tendencias agregados por mes
+        transaction_data (pd.DataFrame): Datos de transacciones
+        
+    Returns:
+        pd.DataFrame: Mismas columnas que calculate_customer_trends_features
+    """
+    trends_columns = [col for col in trends_data.columns if col.startswith('trends_')]
+    
+    has_customer = transaction_data['CustomerID'].notna().to_numpy()
+    customer_codes, customers = pd.factorize(transaction_data['CustomerID'][has_customer], sort=True)
+    month_codes = (transaction_data['InvoiceDate'][has_customer]
+                   .to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64))
+    
+    columns = {'CustomerID': customers}
+    if len(customer_codes) == 0:
+        for col in trends_columns:
+            columns.update({f'avg_{col}': [], f'std_{col}': [], f'max_{col}': []})
+        return pd.DataFrame(columns)
+    
+    first_month = month_codes.min()
+    n_months = month_codes.max() - first_month + 1
+    n_customers = len(customers)
+    
+    # Matriz binaria cliente x mes (un 1 por mes con actividad)
+    activity = sparse.csr_matrix(
+        (np.ones(len(customer_codes), dtype=np.float64), (customer_codes, month_codes - first_month)),
+        shape=(n_customers, n_months)
+    )
+    activity.sum_duplicates()
+    activity.data[:] = 1.0
+    
+    # Tabla de tendencias alineada con los meses de la matriz (NaN si falta el mes)
+    trends = np.full((n_months, len(trends_columns)), np.nan)
+    trend_months = (pd.to_datetime(trends_data['year_month'].astype(str), format='%Y-%m')
+                    .to_numpy(dtype='datetime64[M]').astype(np.int64) - first_month)
+    in_range = (trend_months >= 0) & (trend_months < n_months)
+    trends[trend_months[in_range]] = trends_data.loc[in_range, trends_columns].to_numpy(dtype=np.float64)
+    
+    observed = ~np.isnan(trends)
+    trends_filled = np.where(observed, trends, 0.0)
+    
+    counts = activity @ observed.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (activity @ trends_filled) / counts
+    
+        # Segunda pasada sobre los pares cliente-mes: desviaciones y máximos enmascarados
+        row_starts = activity.indptr[:-1]
+        pair_customers = np.repeat(np.arange(n_customers), np.diff(activity.indptr))
+        pair_trends = trends[activity.indices]
+        deviations = np.where(observed[activity.indices], pair_trends - means[pair_customers], 0.0)
+        squares = np.add.reduceat(deviations ** 2, row_starts, axis=0)
+        stds = np.sqrt(squares / (counts - 1))
+        stds[counts < 2] = np.nan
+        
+        maxima = np.fmax.reduceat(pair_trends, row_starts, axis=0)
+    
+    for k, col in enumerate(trends_columns):
+        columns[f'avg_{col}'] = means[:, k]
+        columns[f'std_{col}'] = stds[:, k]
+        columns[f'max_{col}'] = maxima[:, k]
+    
+    return pd.DataFrame(columns)
+
+
+@instrumented
+def merge_trends_with_customers(customer_data, trends_data, transaction_data, sparse_engine=True):
+    """
+    Combina datos de tendencias con información de clientes
+    
+    Args:
+        customer_data (pd.DataFrame): Datos de clientes
+        trends_data (pd.DataFrame): Datos de tendencias agregados por mes
+        transaction_data (pd.DataFrame): Datos de transacciones
+        sparse_engine (bool): Usar calculate_customer_trends_features_sparse
+            (False = implementación con merge y groupby de pandas)
+        
+    Returns:
+        pd.DataFrame: Dataset combinado con características de tendencias
+    """
+    if sparse_engine:
+        customer_trends_features = calculate_customer_trends_features_sparse(trends_data, transaction_data)
+    else:
+        customer_trends_features = calculate_customer_trends_features(trends_data, transaction_data)
+    
     # Combinar con datos de clientes
     final_dataset = customer_data.merge(customer_trends_features, on='CustomerID', how='left')
     
     # Rellenar valores faltantes con la media
-    for col in new_columns[1:]:  # Excluir CustomerID
+    for col in customer_trends_features.columns[1:]:  # Excluir CustomerID
         if col in final_dataset.columns:
             final_dataset[col] = final_dataset[col].fillna(final_dataset[col].mean())
     
     return final_dataset
 
 
+@instrumented
 def analyze_trends_correlation(df, target_col='IsLoyal'):
     """
     Analiza la correlación entre tendencias y la variable objetivo
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from utils.customer_lookup import CustomerStore
+
+
+def _write_customers(path, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'CustomerID': np.arange(12346, 12346 + n),
+        'Recency': rng.integers(0, 365, n),
+        'Frequency': rng.integers(1, 30, n),
+        'Monetary': np.round(rng.lognormal(6, 1, n), 2),
+        'UniqueProducts': rng.integers(1, 100, n),
+        'Country': 'United Kingdom'
+    }).to_csv(path, index=False)
+
+
+def _brute_force_at_risk(df, n, recency_threshold):
+    at_risk = df[(df['Recency'] > recency_threshold) & (df['Monetary'] > df['Monetary'].median())]
+    return at_risk.nlargest(n, 'Monetary')['CustomerID'].tolist()
+
+
+def test_store_matches_brute_force_after_updates(tmp_path):
+    path = tmp_path / 'customers.csv'
+    _write_customers(path)
+    store = CustomerStore(path)
+    rng = np.random.default_rng(1)
+
+    # Consultar antes de actualizar para que existan rankings que mantener
+    store.top_at_risk(10)
+    # Clientes nuevos o de bajo valor que pasan a valor alto: la mediana se
+    # desplaza poco a poco y cambia quién queda por encima de ella
+    for step in range(40):
+        customer_id = 12346 + int(rng.integers(0, 2100))
+        store.update_customer({
+            'CustomerID': customer_id,
+            'Recency': int(rng.integers(0, 365)),
+            'Frequency': 5,
+            'Monetary': float(rng.uniform(5000, 10000)),
+            'UniqueProducts': 10,
+            'Country': 'United Kingdom'
+        })
+        df = store.df
+        for n in (10, len(df)):
+            expected = _brute_force_at_risk(df, n, 90)
+            assert store.top_at_risk_rows(n)['CustomerID'].tolist() == expected, step
+        expected_top = df.nlargest(10, 'Monetary')['CustomerID'].tolist()
+        assert store.top_by_monetary_rows(10)['CustomerID'].tolist() == expected_top
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from utils.data_utils import clean_retail_data, load_and_clean_retail_data, load_and_clean_retail_data_cached
+
+
+def _raw_transactions():
+    # Tipos mixtos como en el Excel original: facturas y códigos int o str
+    return pd.DataFrame({
+        'InvoiceNo': [536365, 536365, 'C536379', 536380, 'A563185', 536381],
+        'StockCode': ['85123A', 71053, 84406, 'POST', 22633, 71053],
+        'Description': ['WHITE HANGING HEART', 'WHITE METAL LANTERN', 10, None, 'HAND WARMER', 'LANTERN'],
+        'Quantity': [6, 6, -1, 3, 2, 0],
+        'InvoiceDate': ['2010-12-01 08:26', '2010-12-01 08:26', '2010-12-01 09:41', '2010-12-01 09:45',
+                        '2011-08-12 14:50', '2010-12-01 09:57'],
+        'UnitPrice': [2.55, 3.39, 27.5, 18.0, 1.85, 1.25],
+        'CustomerID': [17850.0, 17850.0, 14527.0, None, 12583.0, 12583.0],
+        'Country': ['United Kingdom', 'United Kingdom', 'United Kingdom', 'France', 'France', 'France']
+    })
+
+
+def test_clean_retail_data_does_not_modify_input():
+    raw = _raw_transactions()
+    original = raw.copy()
+    clean_retail_data(raw)
+    pd.testing.assert_frame_equal(raw, original)
+
+
+def test_cached_and_uncached_loads_match(tmp_path):
+    source = tmp_path / 'online_retail.xlsx'
+    _raw_transactions().to_excel(source, index=False)
+    cache_dir = tmp_path / 'cache'
+
+    uncached = load_and_clean_retail_data(source)
+    miss = load_and_clean_retail_data_cached(source, cache_dir=cache_dir)
+    hit = load_and_clean_retail_data_cached(source, cache_dir=cache_dir)
+
+    assert len(list(cache_dir.glob('*.parquet'))) == 1
+    pd.testing.assert_frame_equal(miss, uncached)
+    pd.testing.assert_frame_equal(hit, uncached)
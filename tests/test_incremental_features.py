@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import incremental_features
+from utils.incremental_features import CustomerAggregateState, update_customer_state
+
+
+def _batch(index, n=200):
+    rng = np.random.default_rng(index)
+    quantity = rng.integers(1, 20, n)
+    unit_price = np.round(rng.uniform(0.5, 20, n), 2)
+    return pd.DataFrame({
+        'InvoiceNo': (600000 + index * 100 + rng.integers(0, 50, n)).astype(str),
+        'StockCode': rng.integers(10000, 10100, n).astype(str),
+        'Quantity': quantity,
+        'InvoiceDate': pd.Timestamp('2011-01-01') + pd.to_timedelta(index * 7 + rng.integers(0, 7, n), unit='D'),
+        'UnitPrice': unit_price,
+        'CustomerID': rng.integers(12346, 12446, n).astype(float),
+        'Country': 'United Kingdom',
+        'Revenue': quantity * unit_price
+    })
+
+
+def test_interrupted_compaction_does_not_replay_journal(tmp_path, monkeypatch):
+    state_path = tmp_path / 'customer_state.pkl'
+    batches = [_batch(i) for i in range(5)]
+
+    expected = CustomerAggregateState()
+    for batch in batches:
+        expected.update(batch)
+
+    update_customer_state(state_path, batches[0], compact_every=3)
+    update_customer_state(state_path, batches[1], compact_every=3)
+
+    # El proceso muere tras guardar el snapshot y antes de borrar el diario
+    original_unlink = Path.unlink
+
+    def crash_on_journal(self, *args, **kwargs):
+        if self.name.endswith('.journal'):
+            raise KeyboardInterrupt
+        return original_unlink(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, 'unlink', crash_on_journal)
+    with pytest.raises(KeyboardInterrupt):
+        update_customer_state(state_path, batches[2], compact_every=3)
+    monkeypatch.setattr(Path, 'unlink', original_unlink)
+
+    # Nuevo proceso: sin estados residentes
+    incremental_features._RESIDENT_STATES.clear()
+    update_customer_state(state_path, batches[3], compact_every=3)
+    incremental_features._RESIDENT_STATES.clear()
+    state = update_customer_state(state_path, batches[4], compact_every=3)
+
+    pd.testing.assert_frame_equal(state.to_features(), expected.to_features())
+    np.testing.assert_allclose(state._stats[:len(state)], expected._stats[:len(expected)])
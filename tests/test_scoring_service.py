@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import numpy as np
+from sklearn.feature_selection import SelectKBest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from utils.scoring import DEFAULT_FEATURE_VALUES, MODEL_FEATURE_COLUMNS
+from utils.scoring_service import MicroBatcher, ScoringServer
+
+
+def _batcher():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(MODEL_FEATURE_COLUMNS)))
+    y = (X[:, 0] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    selector = SelectKBest(k=5).fit(scaler.transform(X), y)
+    model = LogisticRegression().fit(selector.transform(scaler.transform(X)), y)
+    return MicroBatcher(model, scaler, selector, max_batch_size=4, max_wait_ms=1.0)
+
+
+def _score(body):
+    async def run():
+        batcher = _batcher()
+        batcher.start()
+        try:
+            return await ScoringServer(batcher)._handle_score(json.dumps(body).encode())
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(run())
+
+
+def test_empty_customer_list_returns_no_results():
+    assert _score({'customers': []}) == {'results': []}
+    assert _score([]) == {'results': []}
+
+
+def test_customers_are_scored_across_batches():
+    customers = [dict(DEFAULT_FEATURE_VALUES, Recency=recency) for recency in range(10)]
+    results = _score({'customers': customers})['results']
+    assert len(results) == 10
+    assert all(set(result) == {'prediction', 'probability'} for result in results)
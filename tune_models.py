@@ -0,0 +1,98 @@
+"""
+Búsqueda de hiperparámetros sobre config.PARAM_GRIDS con successive halving
+
+Uso:
+    python tune_models.py
+    python tune_models.py --models random_forest gradient_boosting --workers 4
+
+Si se interrumpe, al relanzar con el mismo --checkpoint se reanuda sin
+volver a entrenar los ensayos ya terminados. Los ensayos se identifican por
+modelo, parámetros completos, datos, métrica y semilla, así que una ejecución
+con otra --scoring no reutiliza los resultados de la anterior.
+
+Las particiones se preparan como en los notebooks (solo el entrenamiento de
+train_test_split, escalado, ruido y SelectKBest por partición); --fold-cache
+solo decide si se guardan en disco para reutilizarlas entre ejecuciones.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from config import (
+    CACHE_DIR, CV_FOLDS, MODELS_CONFIG, MODELS_DIR, PARAM_GRIDS, PROCESSED_DATA_DIR, RANDOM_STATE,
+    TEST_SIZE
+)
+from utils.batch_scoring import build_country_encoding, prepare_feature_chunk
+from utils.fold_cache import prepare_cv_folds
+from utils.hyperparameter_search import successive_halving_search
+
+import pandas as pd
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros con successive halving")
+    parser.add_argument('--input', default=str(PROCESSED_DATA_DIR / 'customer_features_with_trends.csv'),
+                        help="CSV con las características de clientes e IsLoyal")
+    parser.add_argument('--models', nargs='+', default=None,
+                        help="Modelos de PARAM_GRIDS a buscar (default: todos)")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo")
+    parser.add_argument('--factor', type=int, default=3, help="Factor de poda por ronda")
+    parser.add_argument('--scoring', default='roc_auc')
+    parser.add_argument('--checkpoint', default=str(MODELS_DIR / 'hyperparameter_search.jsonl'))
+    parser.add_argument('--output', default=str(MODELS_DIR / 'best_hyperparameters.json'))
+    parser.add_argument('--fold-cache', action='store_true',
+                        help="Guardar las particiones preparadas en CACHE_DIR/folds y reutilizarlas "
+                             "entre ejecuciones (sin esta opción se usa un directorio temporal)")
+    parser.add_argument('--noise-std', type=float, default=0.2,
+                        help="Ruido gaussiano añadido tras escalar")
+    parser.add_argument('--k-features', type=int, default=10,
+                        help="Características conservadas con SelectKBest (0 = todas)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    customers = pd.read_csv(args.input)
+    X = prepare_feature_chunk(customers, build_country_encoding(args.input))
+    y = customers['IsLoyal'].to_numpy()
+
+    k_features = args.k_features or None
+
+    fold_cache = None
+    if args.fold_cache:
+        fold_cache = prepare_cv_folds(X, y, CACHE_DIR / 'folds', cv_folds=CV_FOLDS,
+                                      random_state=RANDOM_STATE, test_size=TEST_SIZE,
+                                      noise_std=args.noise_std, k_features=k_features)
+        print(f"Particiones preparadas en: {fold_cache.path}")
+
+    results = successive_halving_search(
+        X, y, MODELS_CONFIG, PARAM_GRIDS,
+        model_names=args.models,
+        cv_folds=CV_FOLDS,
+        scoring=args.scoring,
+        factor=args.factor,
+        n_workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        random_state=RANDOM_STATE,
+        test_size=TEST_SIZE,
+        noise_std=args.noise_std,
+        k_features=k_features,
+        fold_cache=fold_cache
+    )
+
+    print("\nMejores hiperparámetros:")
+    for name, best in results['best'].items():
+        print(f"  {name}: {args.scoring} = {best['score']:.4f} ± {best['std']:.4f}  {best['params']}")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results['best'], f, indent=2, default=str)
+    print(f"Resultados guardados en: {args.output}")
+
+
+if __name__ == '__main__':
+    main()